@@ -1,10 +1,81 @@
 """为 OpenClaw Gateway 适配器提供一个最小可用的命令行入口。"""
 
+import sys
+import threading
+from typing import Iterable, Optional
+
 from openclaw_webchat_adapter.ws_adapter import OpenClawChatWsAdapter as adapter
 from openclaw_webchat_adapter.api.client import OpenClawWebChatAPI as client
+
+
+def _stream_to_stdout(chunks: Iterable[str], min_flush_ms: float = 16, min_bytes: int = 256) -> None:
+    """把流式片段攒批后写入 stdout，避免每个 token 一次 write + flush。
+
+    缓冲区达到 min_bytes 时立即写出；否则由定时器在 min_flush_ms 内写出，
+    流在回复中途暂停时已到达的文本也不会滞留在缓冲区中。
+
+    Args:
+        chunks: stream_chat 产出的文本片段。
+        min_flush_ms: 缓冲区中的文本最多滞留的毫秒数。
+        min_bytes: 缓冲区达到该字节数时立即写出。
+    """
+
+    out = getattr(sys.stdout, "buffer", None)
+    if out is None:
+        for chunk in chunks:
+            sys.stdout.write(chunk)
+        sys.stdout.flush()
+        return
+
+    encoding = sys.stdout.encoding or "utf-8"
+    # 先清空文本层缓冲，保证与之前 print 的输出顺序一致
+    sys.stdout.flush()
+    buf = bytearray()
+    interval_s = min_flush_ms / 1000.0
+    lock = threading.Lock()
+    timer: Optional[threading.Timer] = None
+
+    def write_locked() -> None:
+        if buf:
+            out.write(buf)
+            out.flush()
+            buf.clear()
+
+    def on_timer(owner: threading.Timer) -> None:
+        nonlocal timer
+        with lock:
+            # 已被取消或替换的定时器不再清空引用，避免覆盖新定时器
+            if timer is owner:
+                timer = None
+                write_locked()
+
+    def arm() -> threading.Timer:
+        t = threading.Timer(interval_s, lambda: on_timer(t))
+        t.daemon = True
+        t.start()
+        return t
+
+    try:
+        for chunk in chunks:
+            data = chunk.encode(encoding, errors="replace")
+            with lock:
+                buf += data
+                if len(buf) >= min_bytes:
+                    timer = None
+                    write_locked()
+                elif timer is None:
+                    timer = arm()
+    finally:
+        with lock:
+            pending, timer = timer, None
+            write_locked()
+        if pending is not None:
+            pending.cancel()
+
+
 def main() -> int:
     """基于 .env 配置启动交互式 REPL 或执行一次性请求。"""
-    # connect1 = client.create_connected_from_env()
+    # 如需 API 封装，复用同一连接即可：connect1 = client(connect)
     connect = adapter.create_connected_from_env()
     try:
         # while True:
@@ -13,8 +84,7 @@ def main() -> int:
         #         continue
         #     if line.lower() in ("/exit", "/quit"):
         #         break
-        #     for chunk in connect.stream_chat(line):
-        #         print(chunk, end="", flush=True)
+        #     _stream_to_stdout(connect.stream_chat(line))
         #     print("")
         r1 = connect.get_chat_history("agent:main:main")
         print(r1)
@@ -63,9 +63,11 @@ class OpenClawWebChatAPI:
             token=token,
             password=password,
             url=url,
+            dotenv_path=dotenv_path,
+            dotenv_override=dotenv_override,
             ensure_session_key=ensure_session_key,
             timeout_s=timeout_s,
-            device=device
+            device=device,
         )
         return cls(adapter)
 
@@ -4,14 +4,18 @@ from __future__ import annotations
 
 import logging
 import os
+import sys
 from dataclasses import dataclass
-from typing import Optional
+from typing import Any, Dict, Optional, Tuple
 
 from .exceptions import ConfigurationError
 from dotenv import load_dotenv
 
 _logger = logging.getLogger(__name__)
 
+# Python 3.10+ 的 dataclass 支持 slots=True；旧版本退化为普通 dataclass。
+_DATACLASS_SLOTS: Dict[str, Any] = {"slots": True} if sys.version_info >= (3, 10) else {}
+
 def _require_non_empty(value: Optional[str], name: str) -> str:
     """校验配置项存在且非空，并返回清洗后的字符串。
 
@@ -31,11 +35,16 @@ def _require_non_empty(value: Optional[str], name: str) -> str:
     return str(value).strip()
 
 
-def _resolve_dotenv_path(dotenv_path: str) -> str:
+def _resolve_dotenv_path(dotenv_path: str, caller_file: Optional[str] = None) -> str:
     """在不同工作目录运行时，尽可能稳健地解析 .env 的实际路径。
 
+    按 CWD、src 目录、项目根目录的顺序探测，命中即返回。只缓存命中结果，
+    键为 (dotenv_path, cwd, 模块路径)：重复调用 from_env() 时不再触发 stat；
+    未命中不缓存，长驻进程中稍后创建的 .env 仍能被找到。
+
     Args:
         dotenv_path: 调用方传入的路径，可为绝对路径或相对路径。
+        caller_file: 用于推导 src 与项目根目录的模块文件路径；默认为本模块的 __file__。
 
     Returns:
         若在解析出的候选位置找到文件则返回其绝对路径；否则返回原始输入，
@@ -44,28 +53,48 @@ def _resolve_dotenv_path(dotenv_path: str) -> str:
 
     if not isinstance(dotenv_path, str) or not dotenv_path.strip():
         return dotenv_path
+    key = (dotenv_path, os.getcwd(), caller_file or __file__)
+    cached = _DOTENV_PATH_CACHE.get(key)
+    if cached is not None:
+        return cached
+    resolved = _probe_dotenv_path(*key)
+    if resolved is None:
+        return dotenv_path
+    _DOTENV_PATH_CACHE[key] = resolved
+    return resolved
+
 
-    candidate = dotenv_path
-    if os.path.isabs(candidate) and os.path.exists(candidate):
-        return candidate
+# _resolve_dotenv_path 的命中缓存；只存放已找到的文件路径。
+_DOTENV_PATH_CACHE: Dict[Tuple[str, str, str], str] = {}
 
-    if not os.path.isabs(candidate):
-        if os.path.exists(candidate):
-            return os.path.abspath(candidate)
-        package_root = os.path.dirname(os.path.abspath(__file__))
-        src_root = os.path.dirname(package_root)
-        src_candidate = os.path.abspath(os.path.join(src_root, candidate))
-        if os.path.exists(src_candidate):
-            return src_candidate
-        project_root = os.path.dirname(src_root)
-        project_candidate = os.path.abspath(os.path.join(project_root, candidate))
-        if os.path.exists(project_candidate):
-            return project_candidate
 
-    return dotenv_path
+def _probe_dotenv_path(dotenv_path: str, cwd: str, module_file: str) -> Optional[str]:
+    """依次探测候选位置，返回第一个存在的 .env 文件路径。
 
+    候选路径只用 os.path 做字符串拼接与规范化，探测时每个候选一次 stat，
+    不做 Path.resolve() 的符号链接解析。
 
-@dataclass(frozen=True)
+    Args:
+        dotenv_path: 调用方传入的路径。
+        cwd: 调用时的工作目录。
+        module_file: 模块文件路径，用于推导 src 与项目根目录。
+
+    Returns:
+        命中的绝对路径；均未命中时返回 None。
+    """
+
+    if os.path.isabs(dotenv_path):
+        return dotenv_path if os.path.isfile(dotenv_path) else None
+
+    src_root = os.path.dirname(os.path.dirname(os.path.abspath(module_file)))
+    for base in (cwd, src_root, os.path.dirname(src_root)):
+        path = os.path.join(base, dotenv_path)
+        if os.path.isfile(path):
+            return os.path.normpath(path)
+    return None
+
+
+@dataclass(frozen=True, **_DATACLASS_SLOTS)
 class AdapterSettings:
     """保存连接 OpenClaw Gateway 实例所需的配置项。
 
@@ -84,8 +113,8 @@ class AdapterSettings:
         role: connect 请求中的 role 字段。
         scopes_csv: 逗号分隔的 scopes 列表字符串。
         connect_fallback_delay_s: 若未收到 challenge，则延迟后发送 connect 的兜底等待时间。
-        handshake_poll_interval_s: 等待 hello-ok 时的轮询 sleep 间隔。
-        chat_poll_interval_s: 等待 chat 事件时的队列轮询间隔。
+        handshake_poll_interval_s: 已废弃；start() 改为事件等待，不再轮询。保留以兼容旧代码。
+        chat_poll_interval_s: 已废弃；stream_chat 改为按剩余时间阻塞等待，不再轮询。保留以兼容旧代码。
     """
 
     url: str = "ws://127.0.0.1:18789"
@@ -109,9 +138,19 @@ class AdapterSettings:
     chat_poll_interval_s: float = 0.2
 
     @classmethod
-    def from_env(cls) -> "AdapterSettings":
+    def from_env(
+            cls,
+            dotenv_path: str = ".env",
+            dotenv_override: bool = False,
+            caller_file: Optional[str] = None,
+    ) -> "AdapterSettings":
         """从环境变量.env文件加载配置并构造 AdapterSettings。
 
+        Args:
+            dotenv_path: .env 文件路径；相对路径会依次相对 CWD、src 目录与项目根目录解析。
+            dotenv_override: 是否允许 .env 覆盖已存在的环境变量。
+            caller_file: 推导 src 与项目根目录所用的模块文件路径；默认为本模块的 __file__。
+
         Returns:
             AdapterSettings 实例。
 
@@ -119,16 +158,18 @@ class AdapterSettings:
             ConfigurationError: 当必需配置项缺失或格式不合法时抛出。
         """
 
-        load_dotenv()
+        load_dotenv(_resolve_dotenv_path(dotenv_path, caller_file), override=dotenv_override)
+        # slots 模式下类属性是成员描述符而非默认值，默认值从一个默认实例读取
+        defaults = cls()
 
-        url = os.getenv("OPENCLAW_GATEWAY_URL") or cls.url
+        url = os.getenv("OPENCLAW_GATEWAY_URL") or defaults.url
         token = os.getenv("OPENCLAW_GATEWAY_TOKEN") or None
         password = os.getenv("OPENCLAW_GATEWAY_PASSWORD") or None
-        session_key = os.getenv("OPENCLAW_SESSION_KEY") or cls.session_key
+        session_key = os.getenv("OPENCLAW_SESSION_KEY") or defaults.session_key
 
         protocol_version_raw = os.getenv("OPENCLAW_PROTOCOL_VERSION")
 
-        protocol_version = cls.protocol_version
+        protocol_version = defaults.protocol_version
 
         if protocol_version_raw and protocol_version_raw.strip():
             try:
@@ -136,25 +177,36 @@ class AdapterSettings:
             except ValueError as e:
                 raise ConfigurationError("OPENCLAW_PROTOCOL_VERSION must be an integer") from e
 
-        client_id = os.getenv("OPENCLAW_CLIENT_ID") or cls.client_id
-        client_mode = os.getenv("OPENCLAW_CLIENT_MODE") or cls.client_mode
-        client_display_name = os.getenv("OPENCLAW_CLIENT_DISPLAY_NAME") or cls.client_display_name
-        client_version = os.getenv("OPENCLAW_CLIENT_VERSION") or cls.client_version
-        platform = os.getenv("OPENCLAW_CLIENT_PLATFORM") or cls.platform
+        client_id = os.getenv("OPENCLAW_CLIENT_ID") or defaults.client_id
+        client_mode = os.getenv("OPENCLAW_CLIENT_MODE") or defaults.client_mode
+        client_display_name = os.getenv("OPENCLAW_CLIENT_DISPLAY_NAME") or defaults.client_display_name
+        client_version = os.getenv("OPENCLAW_CLIENT_VERSION") or defaults.client_version
+        platform = os.getenv("OPENCLAW_CLIENT_PLATFORM") or defaults.platform
         instance_id = os.getenv("OPENCLAW_CLIENT_INSTANCE_ID") or None
 
-        role = os.getenv("OPENCLAW_CONNECT_ROLE") or cls.role
-        scopes_csv = os.getenv("OPENCLAW_CONNECT_SCOPES") or cls.scopes_csv
-        device_key_file = os.getenv("OPENCLAW_DEVICE_KEY_FILE") or cls.device_key_file
+        role = os.getenv("OPENCLAW_CONNECT_ROLE") or defaults.role
+        scopes_csv = os.getenv("OPENCLAW_CONNECT_SCOPES") or defaults.scopes_csv
+        device_key_file = os.getenv("OPENCLAW_DEVICE_KEY_FILE") or defaults.device_key_file
 
         url = _require_non_empty(url, "OPENCLAW_GATEWAY_URL")
         session_key = _require_non_empty(session_key, "OPENCLAW_SESSION_KEY")
-        _logger.warning(f"""读取到的配置: 
-        [必须]:
-        url={url}, token={token}, password={password}, session_key={session_key}, protocol_version_raw={protocol_version_raw},
-        [其他可选]:
-        protocol_version={protocol_version}, client_id={client_id}, client_mode={client_mode}, client_display_name={client_display_name},
-        client_version={client_version}, platform={platform}, instance_id={instance_id}, role={role}, scopes_csv={scopes_csv}""")
+        # 仅在 DEBUG 开启时格式化；token/password 只记录是否已配置，不输出明文
+        if _logger.isEnabledFor(logging.DEBUG):
+            _logger.debug(
+                "读取到的配置: url=%s session_key=%s token=%s password=%s protocol_version=%s "
+                "client_id=%s client_mode=%s client_version=%s platform=%s role=%s scopes=%s",
+                url,
+                session_key,
+                "<set>" if token else None,
+                "<set>" if password else None,
+                protocol_version,
+                client_id,
+                client_mode,
+                client_version,
+                platform,
+                role,
+                scopes_csv,
+            )
 
         return cls(
             url=url,
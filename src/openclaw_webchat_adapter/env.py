@@ -0,0 +1,180 @@
+"""无需外部依赖，从 .env 文件加载环境变量。"""
+
+from __future__ import annotations
+
+import os
+from dataclasses import dataclass
+from typing import AbstractSet, Dict, Mapping, Optional, Tuple
+
+
+@dataclass(frozen=True)
+class DotenvLoadResult:
+    """返回一次 .env 加载操作的摘要结果。
+
+    Args:
+        loaded_count: 写入到 os.environ 的变量数量。
+        skipped_count: 被跳过的条目数量（如：已存在且未覆盖）。
+        source_path: .env 文件路径。
+    """
+
+    loaded_count: int
+    skipped_count: int
+    source_path: str
+
+
+def parse_dotenv_text(text: str, existing: Optional[AbstractSet[str]] = None) -> Dict[str, str]:
+    """解析 .env 文本内容为键值对字典。
+
+    Args:
+        text: .env 文件的原始文本内容。
+        existing: 可选的已存在 key 集合；其中的 key 不会被解析与返回。
+
+    Returns:
+        解析得到的环境变量字典。
+    """
+
+    return _scan_dotenv_text(text, existing)[0]
+
+
+def _scan_dotenv_text(text: str, existing: Optional[AbstractSet[str]]) -> Tuple[Dict[str, str], int]:
+    """parse_dotenv_text 的实现，同时返回因 existing 而跳过的条目数。
+
+    以下标单遍扫描文本：按 "\n" 与 "=" 的位置直接切出 key/value，
+    只对最终的切片做一次 strip，不再生成逐行列表与中间字符串。
+    key 命中 existing 时在处理 value 之前就跳过。
+
+    Args:
+        text: .env 文件的原始文本内容。
+        existing: 需要跳过的 key 集合；为 None 时不跳过。
+
+    Returns:
+        (parsed, skipped) 二元组。
+    """
+
+    # 与文本模式读取的通用换行一致：\r\n 与单独的 \r（旧式 Mac 换行）都视为行结束
+    if "\r" in text:
+        text = text.replace("\r\n", "\n").replace("\r", "\n")
+    parsed: Dict[str, str] = {}
+    skipped = 0
+    find = text.find
+    n = len(text)
+    i = 0
+    while i < n:
+        nl = find("\n", i)
+        if nl == -1:
+            nl = n
+        eq = find("=", i, nl)
+        if eq != -1:
+            key = text[i:eq].strip()
+            # 空 key 与注释行（首个非空白字符为 #）直接跳过
+            if key and key[0] != "#":
+                if existing is not None and key in existing:
+                    skipped += 1
+                else:
+                    value = text[eq + 1:nl].strip()
+                    if len(value) >= 2 and value[0] == value[-1] and value[0] in "\"'":
+                        value = value[1:-1]
+                    parsed[key] = value
+        i = nl + 1
+    return parsed, skipped
+
+
+def _read_dotenv_file(path: str) -> Optional[Tuple[os.stat_result, str]]:
+    """整体读取 .env 文件。
+
+    Args:
+        path: .env 文件路径。
+
+    Returns:
+        (stat, text) 二元组；stat 取自已打开的文件，与读到的内容一致。文件不存在时返回 None。
+    """
+
+    # 直接打开而非先 exists 再 open：没有检查与打开之间的竞态
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except FileNotFoundError:
+        return None
+    # .env 总是整体读取：按 fstat 得到的大小一次 os.read，省去缓冲读取器与文本包装层
+    try:
+        st = os.fstat(fd)
+        size = st.st_size
+        raw = os.read(fd, size)
+        while len(raw) < size:
+            chunk = os.read(fd, size - len(raw))
+            if not chunk:
+                break
+            raw += chunk
+    finally:
+        os.close(fd)
+    return st, raw.decode("utf-8")
+
+
+# 已读取的 .env 原始文本，按绝对路径缓存；(mtime_ns, size) 变化时视为失效并重新读取。
+# 以绝对路径为键：同一相对路径在不同 CWD 下指向不同文件。
+_DOTENV_CACHE: Dict[str, Tuple[int, int, str]] = {}
+
+
+def load_dotenv(path: str = ".env", override: bool = False) -> Optional[DotenvLoadResult]:
+    """将 .env 文件中的变量加载进 os.environ。
+
+    同一文件未变化时（mtime_ns 与 size 均相同）复用上一次读到的文本，
+    重复调用只需一次 stat。缓存的是文本而非解析结果：不覆盖时按调用时的
+    os.environ 解析，已存在的 key 在处理 value 之前就被跳过。
+
+    只支持 KEY=VALUE 与整值引号，不处理 export 前缀、行内注释、转义与变量插值；
+    AdapterSettings.from_env 仍使用 python-dotenv 读取 .env。
+
+    Args:
+        path: .env 文件路径。
+        override: 是否覆盖 os.environ 中已存在的同名变量。
+
+    Returns:
+        若文件存在并完成解析，返回 DotenvLoadResult；否则返回 None。
+    """
+
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    cache_key = os.path.abspath(path)
+    cached = _DOTENV_CACHE.get(cache_key)
+    if cached is not None and cached[0] == st.st_mtime_ns and cached[1] == st.st_size:
+        text = cached[2]
+    else:
+        result = _read_dotenv_file(path)
+        if result is None:
+            return None
+        st, text = result
+        _DOTENV_CACHE[cache_key] = (st.st_mtime_ns, st.st_size, text)
+
+    if override:
+        return load_dotenv_from_mapping(parse_dotenv_text(text), override=True, source_path=path)
+    environ = os.environ
+    parsed, skipped = _scan_dotenv_text(text, environ.keys())
+    environ.update(parsed)
+    return DotenvLoadResult(loaded_count=len(parsed), skipped_count=skipped, source_path=path)
+
+
+def load_dotenv_from_mapping(
+    mapping: Mapping[str, str],
+    override: bool = False,
+    source_path: str = "<mapping>",
+) -> DotenvLoadResult:
+    """将已解析的键值对合并进 os.environ，不涉及文件读取。
+
+    Args:
+        mapping: 已解析的环境变量键值对（如 parse_dotenv_text 的返回值）。
+        override: 是否覆盖 os.environ 中已存在的同名变量。
+        source_path: 写入结果中的来源标识。
+
+    Returns:
+        本次合并的 DotenvLoadResult。
+    """
+
+    environ = os.environ
+    if override:
+        environ.update(mapping)
+        return DotenvLoadResult(loaded_count=len(mapping), skipped_count=0, source_path=source_path)
+    new = {k: v for k, v in mapping.items() if k not in environ}
+    environ.update(new)
+    return DotenvLoadResult(loaded_count=len(new), skipped_count=len(mapping) - len(new), source_path=source_path)
@@ -2,24 +2,40 @@
 
 from __future__ import annotations
 
+import atexit
 import base64
 import hashlib
+import io
 import json
 import logging
 import queue
+import sched
 import secrets
+import sys
 import threading
 import time
 from dataclasses import dataclass, replace
-from typing import Any, Callable, Dict, Iterator, List, Optional
+from functools import lru_cache
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple, Union
 
 from cryptography.hazmat.primitives.asymmetric import ed25519
 
-from .config import AdapterSettings
+try:
+    import orjson as _orjson  # type: ignore
+except ImportError:  # pragma: no cover
+    _orjson = None
+
+try:
+    import websocket as _websocket_mod  # type: ignore
+except ImportError:  # pragma: no cover
+    _websocket_mod = None
+
+from .config import _DATACLASS_SLOTS, AdapterSettings
 
 from .exceptions import (
     ChatFailedError,
     ChatTimeoutError,
+    ConfigurationError,
     GatewayClosedError,
     ProtocolError,
     RequestFailedError,
@@ -30,14 +46,179 @@ from .exceptions import (
 _logger = logging.getLogger(__name__)
 
 
+def _json_dumps(obj: Any) -> Union[str, bytes]:
+    """将帧序列化为 UTF-8 JSON；安装了 orjson 时直接返回 bytes。"""
+
+    if _orjson is not None:
+        return _orjson.dumps(obj)
+    return json.dumps(obj, ensure_ascii=False)
+
+
+_json_loads: Callable[[Union[str, bytes]], Any] = _orjson.loads if _orjson is not None else json.loads
+
+
+# 默认 WebSocketApp 的 run_forever 参数：入站帧交给 JSON 解析器校验，跳过逐帧 UTF-8 校验；
+# 定期 ping 以便及早发现断开的连接。
+_RUN_FOREVER_KWARGS: Dict[str, Any] = {"skip_utf8_validation": True, "ping_interval": 30, "ping_timeout": 10}
+
+# 连接关闭时投递到 chat 队列的哨兵对象，用于立即唤醒等待中的 stream_chat。
+_CLOSED_SENTINEL: Dict[str, Any] = {}
+
+# WebSocket 关闭时投递到分发队列的标记：分发线程处理完此前的帧后再标记关闭并退出。
+_DISPATCH_CLOSED = object()
+
+# req 帧模板与空 params 单例；二者在多个帧之间共享，只能复制或原样发送，不可原地修改。
+_REQ_PROTO: Dict[str, Any] = {"type": "req", "id": "", "method": "", "params": None}
+_EMPTY_PARAMS: Dict[str, Any] = {}
+
+
+def _req_frame(req_id: str, method: str, params: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """基于 _REQ_PROTO 构造一个 req 帧，只写入随请求变化的字段。
+
+    Args:
+        req_id: 请求 id。
+        method: RPC 方法名。
+        params: 请求参数；为空时使用共享的 _EMPTY_PARAMS。
+
+    Returns:
+        可直接发送的 req 帧字典。
+    """
+
+    frame = _REQ_PROTO.copy()
+    frame["id"] = req_id
+    frame["method"] = method
+    frame["params"] = params or _EMPTY_PARAMS
+    return frame
+
+
+@lru_cache(maxsize=64)
+def _req_frame_affixes(method: str, as_bytes: bool) -> Tuple[Any, Any]:
+    """缓存 req 帧中 id 之前与 id、params 之间的固定文本。
+
+    Args:
+        method: RPC 方法名；按 JSON 规则转义后写入。
+        as_bytes: 是否返回 UTF-8 bytes（与 _json_dumps 的返回类型一致）。
+
+    Returns:
+        (head, middle) 二元组。
+    """
+
+    head = '{"type":"req","id":"'
+    middle = '","method":' + json.dumps(method, ensure_ascii=False) + ',"params":'
+    if as_bytes:
+        return head.encode("utf-8"), middle.encode("utf-8")
+    return head, middle
+
+
+def _encode_req_frame(req_id: str, method: str, params: Optional[Dict[str, Any]]) -> Union[str, bytes]:
+    """序列化一个 req 帧：只对 params 调用 JSON 编码器，其余部分拼接缓存的固定文本。
+
+    req_id 由 _uuid() 生成，仅含十六进制字符，无需转义。
+
+    Args:
+        req_id: 请求 id。
+        method: RPC 方法名。
+        params: 请求参数；为空时使用共享的 _EMPTY_PARAMS。
+
+    Returns:
+        与 _json_dumps 相同类型的 JSON 文本。
+    """
+
+    body = _json_dumps(params or _EMPTY_PARAMS)
+    if type(body) is bytes:
+        head, middle = _req_frame_affixes(method, True)
+        return b"".join((head, req_id.encode("ascii"), middle, body, b"}"))
+    head, middle = _req_frame_affixes(method, False)
+    return "".join((head, req_id, middle, body, "}"))
+
+
+@lru_cache(maxsize=32)
+def _patch_session_frame_parts(key: str, policy: str) -> Tuple[str, str]:
+    """预先序列化 sessions.patch 帧中 id 前后的固定部分。
+
+    ensure_session 在每次启动/重连时都以相同参数调用，帧中只有 id 会变化，
+    因此把其余部分编码一次后缓存，发送时只需拼接 prefix + req_id + suffix。
+    req_id 由 _uuid() 生成，仅含十六进制字符，无需转义。
+
+    Args:
+        key: 需要 patch 的 session key 名称。
+        policy: sendPolicy 取值。
+
+    Returns:
+        (prefix, suffix) 二元组。
+    """
+
+    params = json.dumps({"key": key, "sendPolicy": policy}, ensure_ascii=False, separators=(",", ":"))
+    return '{"type":"req","id":"', f'","method":"sessions.patch","params":{params}}}'
+
+
 def _uuid() -> str:
     """生成一个加密安全的随机字符串，用于 requestId 与 runId。
 
+    这些 id 只用于请求/事件关联与幂等去重，128 位随机数已足够；
+    hex 编码只需一次 os.urandom 并直接格式化，比 base64 编码更省。
+
     Returns:
-        加密安全的随机字符串（URL安全的base64编码）。
+        32 个字符的加密安全随机十六进制字符串。
     """
 
-    return secrets.token_urlsafe(32)
+    return secrets.token_hex(16)
+
+
+class _DelayedCallScheduler:
+    """在单个常驻守护线程中执行所有适配器实例的延迟回调。
+
+    替代每次连接都新建一个 threading.Timer 线程：新任务通过 wakeup 事件
+    唤醒正在休眠的调度线程，使其按最新的队首时间重新计算等待时长。
+    """
+
+    def __init__(self) -> None:
+        self._wakeup = threading.Event()
+        self._sched = sched.scheduler(time.monotonic, self._delay)
+        self._thread_lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    def enter(self, delay: float, action: Callable[[], None]) -> Any:
+        """在 delay 秒后于调度线程中执行 action，返回可用于 cancel 的句柄。"""
+
+        event = self._sched.enter(delay, 1, self._run_action, (action,))
+        self._ensure_thread()
+        self._wakeup.set()
+        return event
+
+    def cancel(self, event: Any) -> None:
+        """取消尚未执行的回调；已执行或已取消时静默忽略。"""
+
+        try:
+            self._sched.cancel(event)
+        except ValueError:
+            pass
+
+    def _ensure_thread(self) -> None:
+        with self._thread_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="openclaw-delayed-calls", daemon=True)
+                self._thread.start()
+
+    def _delay(self, timeout: float) -> None:
+        if self._wakeup.wait(timeout):
+            self._wakeup.clear()
+
+    def _run(self) -> None:
+        while True:
+            self._sched.run()
+            self._wakeup.wait()
+            self._wakeup.clear()
+
+    @staticmethod
+    def _run_action(action: Callable[[], None]) -> None:
+        try:
+            action()
+        except Exception:
+            _logger.debug("延迟回调执行失败", exc_info=True)
+
+
+_DELAYED_CALLS = _DelayedCallScheduler()
 
 
 def _extract_chat_text(message_obj: Any) -> str:
@@ -50,19 +231,74 @@ def _extract_chat_text(message_obj: Any) -> str:
         提取到的文本；若不可提取则返回空字符串。
     """
 
-    if not isinstance(message_obj, dict):
-        return ""
-    content = message_obj.get("content")
-    if not isinstance(content, list) or not content:
+    # 每个 delta 事件都会调用：正常路径只做三次下标访问，结构不符时由异常兜底
+    try:
+        text = message_obj["content"][0]["text"]
+    except (KeyError, IndexError, TypeError):
         return ""
-    first = content[0]
-    if not isinstance(first, dict):
-        return ""
-    text = first.get("text")
-    return text if isinstance(text, str) else ""
+    return text if type(text) is str else ""
+
+
+# 校验累计文本前缀时只比较新旧文本交界处的这么多个字符。
+_PREFIX_ANCHOR_LEN = 32
+
+
+def _text_delta(last_text: str, cur: str) -> str:
+    """根据上一次的累计文本计算本次 delta 事件新增的片段。
+
+    网关的 delta 事件携带的是截至当前的完整累计文本，正常情况下 cur 以
+    last_text 为前缀。这里只校验长度与交界处的一小段字符，使每个事件的开销
+    与累计长度无关；若校验失败（文本被重置），则把 cur 整体视为新片段。
+
+    Args:
+        last_text: 上一次已产出的累计文本。
+        cur: 本次事件中的累计文本。
+
+    Returns:
+        需要产出的新增片段；可能为空字符串。
+    """
+
+    last_len = len(last_text)
+    anchor_start = last_len - _PREFIX_ANCHOR_LEN if last_len > _PREFIX_ANCHOR_LEN else 0
+    if len(cur) >= last_len and cur.startswith(last_text[anchor_start:], anchor_start):
+        return cur[last_len:]
+    return cur
+
+
+def _process_chat_event(evt: Dict[str, Any], last_text: str) -> Tuple[str, str, bool]:
+    """处理一条 chat 事件，返回更新后的累计文本、新增片段以及是否已结束。
 
+    Args:
+        evt: chat 事件的 payload，或连接关闭时投递的 _CLOSED_SENTINEL。
+        last_text: 上一次已产出的累计文本。
+
+    Returns:
+        (new_last_text, chunk, done) 三元组；chunk 可能为空字符串。
+
+    Raises:
+        GatewayClosedError: 当收到连接关闭哨兵时抛出。
+        ChatFailedError: 当对话以 error/aborted 状态结束时抛出。
+    """
 
-@dataclass(frozen=True)
+    if evt is _CLOSED_SENTINEL:
+        raise GatewayClosedError("Gateway closed")
+
+    state = evt.get("state")
+    if state not in ("delta", "final", "error", "aborted"):
+        return last_text, "", False
+    if state in ("error", "aborted"):
+        msg = evt.get("errorMessage")
+        raise ChatFailedError(msg or f"Chat {state}")
+
+    chunk = ""
+    cur = _extract_chat_text(evt.get("message"))
+    if cur:
+        chunk = _text_delta(last_text, cur)
+        last_text = cur
+    return last_text, chunk, state == "final"
+
+
+@dataclass(frozen=True, **_DATACLASS_SLOTS)
 class DeviceIdentity:
     """表示用于设备签名的身份信息。"""
 
@@ -119,13 +355,29 @@ class DeviceIdentity:
         return cls.from_private_key_bytes(data)
 
 
-@dataclass(frozen=True)
+# 历史消息中 role/type/api/provider/model/stopReason 的取值种类很少，驻留后所有消息共享同一字符串对象。
+_intern = sys.intern
+
+
+@dataclass(frozen=True, **_DATACLASS_SLOTS)
 class ChatContentItem:
     type: str
     text: str
 
+    @classmethod
+    def from_wire(cls, d: Any) -> Optional["ChatContentItem"]:
+        """从 chat.history 的 content 元素构造实例；字段缺失或类型不符时返回 None。"""
+
+        if type(d) is not dict:
+            return None
+        t = d.get("type")
+        tx = d.get("text")
+        if type(t) is str and type(tx) is str:
+            return cls(type=_intern(t), text=tx)
+        return None
+
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, **_DATACLASS_SLOTS)
 class ChatUsageCost:
     input: int
     output: int
@@ -133,8 +385,21 @@ class ChatUsageCost:
     cacheWrite: int
     total: int
 
+    @classmethod
+    def from_wire(cls, d: Dict[str, Any]) -> "ChatUsageCost":
+        """从 usage.cost 字典构造实例，缺失字段按 0 处理。"""
+
+        get = d.get
+        return cls(
+            input=get("input", 0),
+            output=get("output", 0),
+            cacheRead=get("cacheRead", 0),
+            cacheWrite=get("cacheWrite", 0),
+            total=get("total", 0),
+        )
+
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, **_DATACLASS_SLOTS)
 class ChatUsage:
     input: int
     output: int
@@ -143,8 +408,27 @@ class ChatUsage:
     totalTokens: int
     cost: ChatUsageCost
 
+    @classmethod
+    def from_wire(cls, d: Any) -> Optional["ChatUsage"]:
+        """从 usage 字典构造实例；缺少 cost 字典时返回 None。"""
 
-@dataclass(frozen=True)
+        if type(d) is not dict:
+            return None
+        cost_raw = d.get("cost")
+        if type(cost_raw) is not dict:
+            return None
+        get = d.get
+        return cls(
+            input=get("input", 0),
+            output=get("output", 0),
+            cacheRead=get("cacheRead", 0),
+            cacheWrite=get("cacheWrite", 0),
+            totalTokens=get("totalTokens", 0),
+            cost=ChatUsageCost.from_wire(cost_raw),
+        )
+
+
+@dataclass(frozen=True, **_DATACLASS_SLOTS)
 class ChatMessage:
     role: str
     content: List[ChatContentItem]
@@ -155,25 +439,373 @@ class ChatMessage:
     usage: Optional[ChatUsage] = None
     stop_reason: Optional[str] = None
 
+    @classmethod
+    def from_wire(cls, d: Any) -> Optional["ChatMessage"]:
+        """从 chat.history 的单条消息构造实例；role/timestamp 不合法时返回 None。
+
+        Args:
+            d: 网关返回的消息字典。
+
+        Returns:
+            ChatMessage 实例；输入不合法时返回 None。
+        """
 
-@dataclass(frozen=True)
+        if type(d) is not dict:
+            return None
+        get = d.get
+        role = get("role")
+        ts = get("timestamp")
+        if type(role) is not str or not isinstance(ts, int):
+            return None
+
+        content_raw = get("content")
+        if type(content_raw) is list:
+            contents = [item for item in map(ChatContentItem.from_wire, content_raw) if item is not None]
+        else:
+            contents = []
+
+        api = get("api")
+        provider = get("provider")
+        model = get("model")
+        stop_reason = get("stopReason")
+        return cls(
+            role=_intern(role),
+            content=contents,
+            timestamp=ts,
+            api=_intern(api) if type(api) is str else None,
+            provider=_intern(provider) if type(provider) is str else None,
+            model=_intern(model) if type(model) is str else None,
+            usage=ChatUsage.from_wire(get("usage")),
+            stop_reason=_intern(stop_reason) if type(stop_reason) is str else None,
+        )
+
+
+@dataclass(frozen=True, **_DATACLASS_SLOTS)
 class ChatMessage_Simple:
     role: str
     content: List[ChatContentItem]
     timestamp: int
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, **_DATACLASS_SLOTS)
 class ChatHistory:
     session_key: str
     session_id: str
     messages: List[ChatMessage]
     thinking_level: Optional[str] = None
 
+    @classmethod
+    def from_wire(cls, payload: Dict[str, Any]) -> "ChatHistory":
+        """从 chat.history 的响应 payload 构造实例，单次遍历消息列表。
+
+        Args:
+            payload: chat.history 的响应 payload。
+
+        Returns:
+            ChatHistory 实例；不合法的消息会被跳过。
+        """
+
+        get = payload.get
+        sk = get("sessionKey")
+        sid = get("sessionId")
+        tl = get("thinkingLevel")
+        msgs_raw = get("messages")
+        if type(msgs_raw) is list:
+            msgs = [msg for msg in map(ChatMessage.from_wire, msgs_raw) if msg is not None]
+        else:
+            msgs = []
+        return cls(
+            session_key=sk if type(sk) is str else "",
+            session_id=sid if type(sid) is str else "",
+            messages=msgs,
+            thinking_level=tl if type(tl) is str else None,
+        )
+
 
 WsFactory = Callable[..., Any]
 
 
+def _normalize_optional(value: Optional[str]) -> Optional[str]:
+    """去除首尾空白；None 与空白字符串统一返回 None。"""
+
+    if value is None:
+        return None
+    return value.strip() or None
+
+
+# create_connected_from_env 的进程级连接缓存，键为 (cls, settings, device_id)。
+# 缓存实例按引用计数共享：每个调用方拿到一个 _SharedAdapterHandle 并持有一次引用，
+# 句柄首次 stop() 时释放，归零时才真正关闭并移出缓存。
+_ADAPTER_CACHE: Dict[Tuple[Any, ...], "OpenClawChatWsAdapter"] = {}
+_ADAPTER_CACHE_LOCK = threading.Lock()
+
+
+def _close_cached_adapters() -> None:
+    """进程退出时关闭缓存中的所有连接（不论引用计数），避免遗留 socket。"""
+
+    with _ADAPTER_CACHE_LOCK:
+        adapters = list(_ADAPTER_CACHE.values())
+        _ADAPTER_CACHE.clear()
+        for adapter in adapters:
+            adapter._cache_key = None
+            adapter._cache_refs = 0
+    for adapter in adapters:
+        try:
+            adapter.stop()
+        except Exception:
+            _logger.debug("关闭缓存连接失败", exc_info=True)
+
+
+atexit.register(_close_cached_adapters)
+
+
+class _SharedAdapterHandle:
+    """create_connected_from_env 交给每个调用方的缓存适配器句柄。
+
+    除 stop() 外的属性与方法都转发给共享的适配器。stop() 只释放本句柄持有的
+    一次引用，重复调用（如先 stop() 再 close()）为 no-op，不会关闭其他持有者的连接。
+    """
+
+    __slots__ = ("_shared", "_released")
+
+    def __init__(self, shared: "OpenClawChatWsAdapter"):
+        """包装共享适配器；调用方需已在 _ADAPTER_CACHE_LOCK 下为其增加一次引用。
+
+        Args:
+            shared: 缓存中的共享适配器实例。
+        """
+
+        self._shared = shared
+        self._released = False
+
+    def __getattr__(self, name: str) -> Any:
+        """将句柄自身没有的属性转发给共享适配器。"""
+
+        return getattr(self._shared, name)
+
+    def stop(self) -> None:
+        """释放本句柄的引用；最后一个引用释放时关闭连接并移出缓存。"""
+
+        shared = self._shared
+        with _ADAPTER_CACHE_LOCK:
+            if self._released:
+                return
+            self._released = True
+            shared._cache_refs -= 1
+            if shared._cache_refs > 0:
+                return
+            # 连接断开后缓存项可能已被新实例替换，此时只清理自身
+            if _ADAPTER_CACHE.get(shared._cache_key) is shared:
+                del _ADAPTER_CACHE[shared._cache_key]
+            shared._cache_key = None
+        shared.stop()
+
+
+class _Waiter:
+    """单次 RPC 响应的交接槽：读线程写入 result 后置位 event。
+
+    相比 queue.Queue(maxsize=1)，只需一个 Event（一把锁 + 一个 Condition）。
+    """
+
+    __slots__ = ("event", "result")
+
+    def __init__(self) -> None:
+        self.event = threading.Event()
+        self.result: Optional[Dict[str, Any]] = None
+
+
+# 以下帧与 RPC 处理逻辑由同步与 asyncio 两个适配器共用，二者只负责各自的等待与唤醒方式。
+
+def _decode_frame(message: Union[str, bytes]) -> Optional[Dict[str, Any]]:
+    """解析一个入站帧；非法 JSON 或非对象帧返回 None。"""
+
+    try:
+        frame = _json_loads(message)
+    except Exception:
+        return None
+    return frame if isinstance(frame, dict) else None
+
+
+def _validate_request_args(method: Any, params: Any) -> None:
+    """校验 request() 的 method/params 入参。
+
+    Raises:
+        ValueError: 当 method 不是非空字符串，或 params 不是 dict/None 时抛出。
+    """
+
+    if not isinstance(method, str) or not method.strip():
+        raise ValueError("method must be a non-empty string")
+    if params is not None and not isinstance(params, dict):
+        raise ValueError("params must be a dict or None")
+
+
+def _rpc_result(res: Dict[str, Any]) -> Dict[str, Any]:
+    """将 RPC 响应帧转换为 payload 字典。
+
+    Raises:
+        RequestFailedError: 当网关返回 ok=false 时抛出。
+    """
+
+    if res.get("ok") is True:
+        payload = res.get("payload")
+        return payload if isinstance(payload, dict) else {"payload": payload}
+    err = res.get("error") or {}
+    message = err.get("message") if isinstance(err, dict) else None
+    raise RequestFailedError(message or "Request failed")
+
+
+def _route_chat_event(frame: Dict[str, Any], chat_queues: Dict[str, Any]) -> Optional[Tuple[Any, Dict[str, Any]]]:
+    """为 chat event 帧找到对应 runId 的队列。
+
+    Returns:
+        (队列, payload) 二元组；帧畸形或没有等待该 runId 的 stream_chat 时返回 None。
+    """
+
+    # 热路径：格式正确的帧直接取值，畸形帧（缺字段 / 类型不符）由异常兜底丢弃
+    try:
+        payload = frame["payload"]
+        q = chat_queues.get(payload["runId"])
+    except (KeyError, TypeError):
+        return None
+    return None if q is None else (q, payload)
+
+
+def _challenge_nonce(frame: Dict[str, Any]) -> Optional[str]:
+    """从 connect.challenge 帧中取出 nonce；缺失或类型不符时返回 None。"""
+
+    payload = frame.get("payload") or {}
+    nonce = payload.get("nonce") if isinstance(payload, dict) else None
+    return nonce if isinstance(nonce, str) else None
+
+
+def _handshake_outcome(
+        frame: Dict[str, Any], connect_req_id: Optional[str]
+) -> Optional[Tuple[Any, Optional[ProtocolError]]]:
+    """判断一个未匹配到等待者的 response 帧是否结束了握手。
+
+    Args:
+        frame: response 帧。
+        connect_req_id: 已发送的 connect 请求 id；尚未发送时为 None。
+
+    Returns:
+        hello-ok 时返回 (payload, None)；connect 被拒绝时返回 (None, ProtocolError)；
+        与握手无关时返回 None。
+    """
+
+    req_id = frame.get("id")
+    payload = frame.get("payload")
+    if (isinstance(payload, dict) and payload.get("type") == "hello-ok") or \
+       (req_id == connect_req_id and frame.get("ok") is True):
+        return payload, None
+    if req_id and req_id == connect_req_id and frame.get("ok") is False:
+        err = frame.get("error") or {}
+        msg = err.get("message") if isinstance(err, dict) else None
+        return None, ProtocolError(msg or "Connect failed")
+    return None
+
+
+@lru_cache(maxsize=8)
+def _connect_params_template(settings: AdapterSettings) -> Dict[str, Any]:
+    """按 settings 缓存 connect params 中不随连接变化的部分。
+
+    AdapterSettings 是不可变且可哈希的，client/role/scopes/auth 均只由它决定，
+    因此重连时无需再次拆分 scopes_csv 或重建这些字典。返回的字典被多次共享，
+    调用方只能复制后再修改。
+
+    Args:
+        settings: 连接与握手配置。
+
+    Returns:
+        不含 client.instanceId 与 device 字段的 params 模板。
+    """
+
+    params: Dict[str, Any] = {
+        "minProtocol": settings.protocol_version,
+        "maxProtocol": settings.protocol_version,
+        "client": {
+            "id": settings.client_id,
+            "displayName": settings.client_display_name,
+            "version": settings.client_version,
+            "platform": settings.platform,
+            "mode": settings.client_mode,
+        },
+        "role": settings.role,
+        "scopes": tuple(s.strip() for s in settings.scopes_csv.split(",") if s.strip()),
+    }
+
+    auth: Dict[str, Any] = {}
+    if settings.token:
+        auth["token"] = settings.token
+    if settings.password:
+        auth["password"] = settings.password
+    if auth:
+        params["auth"] = auth
+    return params
+
+
+@lru_cache(maxsize=8)
+def _signature_payload_middle(settings: AdapterSettings) -> str:
+    """缓存设备签名载荷中由 settings 决定的中间段 clientId|clientMode|role|scopes。
+
+    Args:
+        settings: 连接与握手配置。
+
+    Returns:
+        与 connect params 中 scopes 一致的中间段字符串。
+    """
+
+    scopes_str = ",".join(_connect_params_template(settings)["scopes"])
+    return f"{settings.client_id}|{settings.client_mode}|{settings.role}|{scopes_str}"
+
+
+def _build_connect_params(
+        settings: AdapterSettings,
+        device: Optional[DeviceIdentity] = None,
+        nonce: Optional[str] = None,
+        instance_id: Optional[str] = None,
+) -> Dict[str, Any]:
+    """构造 connect 握手请求的 params，供同步与异步适配器共用。
+
+    Args:
+        settings: 连接与握手配置。
+        device: 可选的设备身份信息；提供时附带签名后的 device 字段。
+        nonce: connect.challenge 下发的 nonce；未收到时为 None。
+        instance_id: client.instanceId；为 None 时回退到 settings.instance_id，
+            仍为空则生成一次性的 `py-<uuid>`。
+
+    Returns:
+        connect 请求的 params 字典。
+    """
+
+    template = _connect_params_template(settings)
+    params = dict(template)
+    params["client"] = dict(template["client"], instanceId=instance_id or settings.instance_id or f"py-{_uuid()}")
+
+    if device is not None:
+        signed_at = int(time.time() * 1000)
+        nonce = nonce or ""
+
+        # 这里的参数必须和 connect.params 里的完全一致！
+        # 格式: version|deviceId|clientId|clientMode|role|scopes|signedAtMs|token|nonce
+        device_id = device.device_id
+        token_val = settings.token or ""
+        payload = f"v2|{device_id}|{_signature_payload_middle(settings)}|{signed_at}|{token_val}|{nonce}"
+
+        signature = device.sign_payload(payload)
+        # 签名载荷中含 token，只记录设备 id
+        _logger.debug("已为设备 %s 生成 connect 签名", device_id)
+
+        params["device"] = {
+            "id": device_id,
+            "publicKey": device.public_key_b64,
+            "signature": signature,
+            "signedAt": signed_at,
+            "nonce": nonce,
+        }
+
+    return params
+
+
 class OpenClawChatWsAdapter:
     """通过 WebSocket 连接 OpenClaw Gateway，并提供流式聊天 API。"""
 
@@ -209,9 +841,13 @@ class OpenClawChatWsAdapter:
         server = hello.get("server") if isinstance(hello, dict) else None
         conn_id = server.get("connId") if isinstance(server, dict) else None
         protocol = hello.get("protocol") if isinstance(hello, dict) else None
-        _logger.warning("已连接 OpenClaw Gateway：url=%s protocol=%s connId=%s", settings.url, protocol, conn_id)
+        # 生产环境通常只开 WARNING：先判断级别，跳过 LogRecord 构造与参数格式化
+        log_info = _logger.isEnabledFor(logging.INFO)
+        if log_info:
+            _logger.info("已连接 OpenClaw Gateway：url=%s protocol=%s connId=%s", settings.url, protocol, conn_id)
         adapter.ensure_session(ensure_session_key)
-        _logger.warning("会话已就绪：session=%s sendPolicy=allow", ensure_session_key)
+        if log_info:
+            _logger.info("会话已就绪：session=%s sendPolicy=allow", ensure_session_key)
         return adapter
 
     @classmethod
@@ -220,6 +856,8 @@ class OpenClawChatWsAdapter:
             token: Optional[str] = None,
             password: Optional[str] = None,
             url: Optional[str] = None,
+            dotenv_path: str = ".env",
+            dotenv_override: bool = False,
             ensure_session_key: str = "main",
             timeout_s: float = 12.0,
             device: Optional[DeviceIdentity] = None,
@@ -239,16 +877,17 @@ class OpenClawChatWsAdapter:
             ws_factory: 可选的 WebSocketApp 工厂，用于测试/依赖注入。
 
         Returns:
-            已完成握手并确保会话可发送的适配器实例。
-        """
+            已完成握手并确保会话可发送的适配器。对相同配置（完整的 AdapterSettings）
+            与设备身份的重复调用共享同一条仍处于连接状态的缓存连接
+            （注入 ws_factory 时不缓存；命中时不再握手，timeout_s 不起作用）。
+            每个调用方拿到各自的句柄，接口与适配器一致；句柄的 stop() 可重复调用，
+            最后一个持有者 stop() 时才真正关闭连接，之后的调用会重新建立连接。
 
-        def _normalize_optional(value: Optional[str]) -> Optional[str]:
-            if value is None:
-                return None
-            stripped = str(value).strip()
-            return stripped or None
+        Raises:
+            ConfigurationError: 当必需配置缺失，或 token 与 password 均未配置时抛出。
+        """
 
-        settings = AdapterSettings.from_env()
+        settings = AdapterSettings.from_env(dotenv_path=dotenv_path, dotenv_override=dotenv_override)
 
         url = _normalize_optional(url)
         token = _normalize_optional(token)
@@ -262,6 +901,44 @@ class OpenClawChatWsAdapter:
                 password=password if password is not None else settings.password,
             )
 
+        if settings.token is None and settings.password is None:
+            raise ConfigurationError("Missing required configuration: OPENCLAW_GATEWAY_TOKEN or OPENCLAW_GATEWAY_PASSWORD")
+
+        if ws_factory is not None:
+            return cls._connect_from_settings(settings, timeout_s, device, ws_factory)
+
+        # AdapterSettings 为 frozen dataclass，可直接作为键，覆盖 scopes/role 等全部握手字段
+        cache_key = (cls, settings, device.device_id if device is not None else None)
+        with _ADAPTER_CACHE_LOCK:
+            cached = _ADAPTER_CACHE.get(cache_key)
+            if cached is not None and cached._is_live():
+                cached._cache_refs += 1
+                return _SharedAdapterHandle(cached)  # type: ignore[return-value]
+
+        # 握手在锁外完成，慢连接不会阻塞其他调用方；插入前再检查一次
+        adapter = cls._connect_from_settings(settings, timeout_s, device, None)
+        with _ADAPTER_CACHE_LOCK:
+            cached = _ADAPTER_CACHE.get(cache_key)
+            if cached is None or not cached._is_live():
+                adapter._cache_key = cache_key
+                adapter._cache_refs = 1
+                _ADAPTER_CACHE[cache_key] = adapter
+                return _SharedAdapterHandle(adapter)  # type: ignore[return-value]
+            cached._cache_refs += 1
+        # 并发调用方已先建立同一配置的连接：沿用其实例，关闭本次多建的连接
+        adapter.stop()
+        return _SharedAdapterHandle(cached)  # type: ignore[return-value]
+
+    @classmethod
+    def _connect_from_settings(
+            cls,
+            settings: AdapterSettings,
+            timeout_s: float,
+            device: Optional[DeviceIdentity],
+            ws_factory: Optional[WsFactory],
+    ) -> "OpenClawChatWsAdapter":
+        """加载（或生成）设备身份后调用 create_connected 建立连接。"""
+
         # 自动管理设备身份持久化
         if device is None and settings.device_key_file:
             device = DeviceIdentity.load_from_file(settings.device_key_file)
@@ -269,11 +946,11 @@ class OpenClawChatWsAdapter:
                 device = DeviceIdentity.generate()
                 try:
                     device.save_to_file(settings.device_key_file)
-                    _logger.info(f"已生成新的设备身份并保存至 {settings.device_key_file}")
+                    _logger.info("已生成新的设备身份并保存至 %s", settings.device_key_file)
                 except Exception as e:
-                    _logger.warning(f"保存设备身份失败: {e}")
+                    _logger.warning("保存设备身份失败: %s", e)
             else:
-                _logger.info(f"已从 {settings.device_key_file} 加载现有设备身份")
+                _logger.info("已从 %s 加载现有设备身份", settings.device_key_file)
 
         return cls.create_connected(
             settings=settings,
@@ -299,28 +976,44 @@ class OpenClawChatWsAdapter:
 
         self._settings = settings
         self._device = device
+        # 未配置 instance_id 时只生成一次，重连时沿用同一实例标识
+        self._instance_id = settings.instance_id or f"py-{_uuid()}"
         self._ws_factory = ws_factory or self._default_ws_factory
 
         self._ws: Optional[Any] = None
         self._thread: Optional[threading.Thread] = None
         self._closed = threading.Event()
         self._hello_ok = threading.Event()
+        # hello-ok、connect 失败或连接关闭任一发生时置位，供 start() 单次等待。
+        self._handshake_done = threading.Event()
         self._hello_payload: Optional[Dict[str, Any]] = None
         self._connect_nonce: Optional[str] = None
         self._connect_sent = False
         self._connect_req_id: Optional[str] = None
+        self._connect_fallback: Optional[Any] = None
         self._last_error: Optional[BaseException] = None
 
+        # 由 create_connected_from_env 缓存时的键与句柄数量，受 _ADAPTER_CACHE_LOCK 保护
+        self._cache_key: Optional[Tuple[Any, ...]] = None
+        self._cache_refs = 0
+
         # 资源限制常量
         self._MAX_PENDING_REQUESTS = 100
         self._MAX_CHAT_SESSIONS = 50
 
-        self._pending: Dict[str, "queue.Queue[Dict[str, Any]]"] = {}
+        # 锁只保护 _pending/_chat_queues 的写入（插入、pop）与 _mark_closed 中的遍历；
+        # ws 线程按 id 查找时直接 dict.get，单次 get 在 GIL 下是原子的，
+        # 读到的要么是已注册的对象，要么是 None（对应请求已结束，丢弃即可）。
+        self._pending: Dict[str, _Waiter] = {}
         self._pending_lock = threading.Lock()
 
         self._chat_queues: Dict[str, "queue.Queue[Dict[str, Any]]"] = {}
         self._chat_lock = threading.Lock()
 
+        # ws 读线程只把原始消息放入该队列，解析与路由由分发线程完成
+        self._dispatch_q: "queue.SimpleQueue[Any]" = queue.SimpleQueue()
+        self._dispatcher: Optional[threading.Thread] = None
+
     @property
     def hello_payload(self) -> Optional[Dict[str, Any]]:
         """在 start() 成功后返回 hello-ok 的 payload。
@@ -351,12 +1044,19 @@ class OpenClawChatWsAdapter:
 
         self._closed.clear()
         self._hello_ok.clear()
+        self._handshake_done.clear()
         self._hello_payload = None
         self._connect_nonce = None
         self._connect_sent = False
         self._connect_req_id = None
         self._last_error = None
 
+        self._dispatch_q = queue.SimpleQueue()
+        self._dispatcher = threading.Thread(
+            target=self._run_dispatch, args=(self._dispatch_q,), name="openclaw-dispatch", daemon=True
+        )
+        self._dispatcher.start()
+
         self._ws = self._ws_factory(
             self._settings.url,
             on_open=self._on_open,
@@ -364,20 +1064,18 @@ class OpenClawChatWsAdapter:
             on_error=self._on_error,
             on_close=self._on_close,
         )
-        self._thread = threading.Thread(target=self._ws.run_forever, daemon=True)
+        # 调优参数只传给默认的 websocket-client 实现，注入的工厂不一定支持这些参数
+        run_kwargs = _RUN_FOREVER_KWARGS if self._ws_factory == self._default_ws_factory else {}
+        self._thread = threading.Thread(target=self._ws.run_forever, kwargs=run_kwargs, daemon=True)
         self._thread.start()
 
-        deadline = time.time() + timeout_s * 10
-        while time.time() < deadline:
-            if self._hello_ok.is_set():
-                return self._hello_payload or {}
-            if self._closed.is_set():
-                if self._last_error:
-                    raise RuntimeError(str(self._last_error))
-                raise GatewayClosedError("Gateway closed before hello-ok")
-            time.sleep(self._settings.handshake_poll_interval_s)
+        self._handshake_done.wait(timeout_s)
+        if self._hello_ok.is_set():
+            return self._hello_payload or {}
         if self._last_error:
             raise RuntimeError(str(self._last_error))
+        if self._closed.is_set():
+            raise GatewayClosedError("Gateway closed before hello-ok")
         raise RequestTimeoutError("Handshake timeout: hello-ok not received")
 
     def stop(self) -> None:
@@ -385,12 +1083,19 @@ class OpenClawChatWsAdapter:
 
         if self._ws is None:
             return
+        self._cancel_connect_fallback()
         try:
             self._ws.close()
         finally:
-            self._closed.set()
+            self._mark_closed()
+            self._dispatch_q.put(_DISPATCH_CLOSED)
             self._ws = None
 
+    def _is_live(self) -> bool:
+        """握手已完成且连接未关闭时返回 True。"""
+
+        return self._hello_ok.is_set() and not self._closed.is_set()
+
     def request(self, method: str, params: Optional[Dict[str, Any]] = None, timeout_s: float = 15.0) -> Dict[str, Any]:
         """发送一次 RPC 请求并等待响应。
 
@@ -405,44 +1110,66 @@ class OpenClawChatWsAdapter:
         Raises:
             RequestTimeoutError: 当超时仍未收到响应时抛出。
             RequestFailedError: 当网关返回 ok=false 时抛出。
+            GatewayClosedError: 当网关连接已关闭或在等待响应期间关闭时抛出。
             ValueError: 当 method/params 的输入类型不合法时抛出。
             RuntimeError: 当握手未完成即调用时抛出。
         """
 
+        _validate_request_args(method, params)
+        return self._request(method, timeout_s, params=params)
+
+    def _request(
+            self,
+            method: str,
+            timeout_s: float,
+            params: Optional[Dict[str, Any]] = None,
+            raw_parts: Optional[Tuple[str, str]] = None,
+    ) -> Dict[str, Any]:
+        """request() 的实现：注册等待者、发送帧并等待响应。
+
+        Args:
+            method: RPC 方法名。
+            timeout_s: 等待响应的最大秒数。
+            params: RPC 参数字典；raw_parts 为 None 时使用。
+            raw_parts: 预先序列化的 (prefix, suffix)；提供时直接拼接 req_id 发送。
+
+        Returns:
+            响应 payload 字典。
+        """
+
+        # 关闭后 hello_ok 仍保持置位，须先判断，否则请求要等满 timeout_s 才失败
+        if self._closed.is_set():
+            raise GatewayClosedError(f"Gateway closed: {method}")
         if not self._hello_ok.is_set():
             raise RuntimeError("Gateway not connected (hello-ok not received)")
-        if not isinstance(method, str) or not method.strip():
-            raise ValueError("method must be a non-empty string")
-        if params is not None and not isinstance(params, dict):
-            raise ValueError("params must be a dict or None")
 
-        # 检查资源限制
+        req_id = _uuid()
+        waiter = _Waiter()
+        # 资源限制检查与注册在同一次加锁内完成
         with self._pending_lock:
+            # _mark_closed 先置位 _closed 再在锁内唤醒 _pending；锁内复查可避免注册一个已无人唤醒的等待者
+            if self._closed.is_set():
+                raise GatewayClosedError(f"Gateway closed: {method}")
             if len(self._pending) >= self._MAX_PENDING_REQUESTS:
                 raise ResourceLimitError(f"Too many pending requests (max: {self._MAX_PENDING_REQUESTS})")
+            self._pending[req_id] = waiter
 
-        req_id = _uuid()
-        q: "queue.Queue[Dict[str, Any]]" = queue.Queue(maxsize=1)
-        with self._pending_lock:
-            self._pending[req_id] = q
-
-        frame = {"type": "req", "id": req_id, "method": method, "params": params or {},
-                 }
-        self._send(frame)
+        if raw_parts is None:
+            data: Union[str, bytes] = _encode_req_frame(req_id, method, params)
+        else:
+            data = raw_parts[0] + req_id + raw_parts[1]
         try:
-            res = q.get(timeout=timeout_s)
-        except queue.Empty as e:
-            raise RequestTimeoutError(f"Request timeout: {method}") from e
+            self._send_raw(data)
+            if not waiter.event.wait(timeout_s):
+                raise RequestTimeoutError(f"Request timeout: {method}")
         finally:
             with self._pending_lock:
                 self._pending.pop(req_id, None)
 
-        if res.get("ok") is True:
-            payload = res.get("payload")
-            return payload if isinstance(payload, dict) else {"payload": payload}
-        err = res.get("error") or {}
-        message = err.get("message") if isinstance(err, dict) else None
-        raise RequestFailedError(message or "Request failed")
+        res = waiter.result
+        if res is None:
+            raise GatewayClosedError(f"Gateway closed while waiting for response: {method}")
+        return _rpc_result(res)
 
     def ensure_session(self, key: str = "main", timeout_s: float = 15.0) -> Dict[str, Any]:
         """确保指定 session 存在，并按会话策略允许发送聊天。
@@ -457,7 +1184,7 @@ class OpenClawChatWsAdapter:
 
         if not isinstance(key, str) or not key.strip():
             raise ValueError("key must be a non-empty string")
-        return self.request("sessions.patch", {"key": key, "sendPolicy": "allow"}, timeout_s=timeout_s)
+        return self._request("sessions.patch", timeout_s, raw_parts=_patch_session_frame_parts(key, "allow"))
 
     def get_chat_history_simple(
             self,
@@ -483,7 +1210,7 @@ class OpenClawChatWsAdapter:
 
     def get_chat_history(
             self,
-            session_key: str,
+            session_key: Optional[str] = None,
             limit: int = 200,
             timeout_s: float = 15.0,
     ) -> ChatHistory:
@@ -499,69 +1226,7 @@ class OpenClawChatWsAdapter:
         return self._map_chat_history_payload(payload)
 
     def _map_chat_history_payload(self, payload: Dict[str, Any]) -> ChatHistory:
-        sk = payload.get("sessionKey")
-        sid = payload.get("sessionId")
-        tl = payload.get("thinkingLevel")
-        msgs_raw = payload.get("messages") or []
-        msgs: List[ChatMessage] = []
-        if isinstance(msgs_raw, list):
-            for m in msgs_raw:
-                if not isinstance(m, dict):
-                    continue
-                role = m.get("role")
-                ts = m.get("timestamp")
-                contents: List[ChatContentItem] = []
-                content_raw = m.get("content") or []
-                if isinstance(content_raw, list):
-                    for c in content_raw:
-                        if isinstance(c, dict):
-                            t = c.get("type")
-                            tx = c.get("text")
-                            if isinstance(t, str) and isinstance(tx, str):
-                                contents.append(ChatContentItem(type=t, text=tx))
-                api = m.get("api")
-                provider = m.get("provider")
-                model = m.get("model")
-                usage_obj = None
-                usage_raw = m.get("usage")
-                if isinstance(usage_raw, dict):
-                    cost_raw = usage_raw.get("cost")
-                    if isinstance(cost_raw, dict):
-                        cost = ChatUsageCost(
-                            input=cost_raw.get("input", 0),
-                            output=cost_raw.get("output", 0),
-                            cacheRead=cost_raw.get("cacheRead", 0),
-                            cacheWrite=cost_raw.get("cacheWrite", 0),
-                            total=cost_raw.get("total", 0),
-                        )
-                        usage_obj = ChatUsage(
-                            input=usage_raw.get("input", 0),
-                            output=usage_raw.get("output", 0),
-                            cacheRead=usage_raw.get("cacheRead", 0),
-                            cacheWrite=usage_raw.get("cacheWrite", 0),
-                            totalTokens=usage_raw.get("totalTokens", 0),
-                            cost=cost,
-                        )
-                stop_reason = m.get("stopReason")
-                if isinstance(role, str) and isinstance(ts, int):
-                    msgs.append(
-                        ChatMessage(
-                            role=role,
-                            content=contents,
-                            timestamp=ts,
-                            api=api if isinstance(api, str) else None,
-                            provider=provider if isinstance(provider, str) else None,
-                            model=model if isinstance(model, str) else None,
-                            usage=usage_obj,
-                            stop_reason=stop_reason if isinstance(stop_reason, str) else None,
-                        )
-                    )
-        return ChatHistory(
-            session_key=sk if isinstance(sk, str) else "",
-            session_id=sid if isinstance(sid, str) else "",
-            messages=msgs,
-            thinking_level=tl if isinstance(tl, str) else None,
-        )
+        return ChatHistory.from_wire(payload)
 
     def stream_chat(self, user_request: str, timeout_s: float = 120.0) -> Iterator[str]:
         """针对用户输入流式产出 assistant 的增量文本片段。
@@ -582,15 +1247,15 @@ class OpenClawChatWsAdapter:
         if not isinstance(user_request, str) or not user_request.strip():
             return iter(())
 
-        # 检查聊天会话数量限制
-        with self._chat_lock:
-            if len(self._chat_queues) >= self._MAX_CHAT_SESSIONS:
-                raise ResourceLimitError(f"Too many chat sessions (max: {self._MAX_CHAT_SESSIONS})")
-
         run_id = _uuid()
         q: "queue.Queue[Dict[str, Any]]" = queue.Queue()
+        # 会话数量限制检查与注册在同一次加锁内完成
         with self._chat_lock:
+            if len(self._chat_queues) >= self._MAX_CHAT_SESSIONS:
+                raise ResourceLimitError(f"Too many chat sessions (max: {self._MAX_CHAT_SESSIONS})")
             self._chat_queues[run_id] = q
+            if self._closed.is_set():
+                q.put(_CLOSED_SENTINEL)
 
         try:
             _ = self.request(
@@ -604,33 +1269,37 @@ class OpenClawChatWsAdapter:
             )
 
             last_text = ""
-            deadline = time.time() + timeout_s
-            while time.time() < deadline:
+            deadline = time.monotonic() + timeout_s
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
                 try:
-                    evt = q.get(timeout=self._settings.chat_poll_interval_s)
+                    evt = q.get(timeout=remaining)
                 except queue.Empty:
-                    if self._closed.is_set():
-                        raise GatewayClosedError("Gateway closed")
-                    continue
-
-                state = evt.get("state")
-                if state not in ("delta", "final", "error", "aborted"):
-                    continue
-                if state in ("error", "aborted"):
-                    msg = evt.get("errorMessage")
-                    raise ChatFailedError(msg or f"Chat {state}")
-
-                msg_obj = evt.get("message")
-                cur = _extract_chat_text(msg_obj)
-                if cur:
-                    if cur.startswith(last_text):
-                        chunk = cur[len(last_text):]
-                    else:
-                        chunk = cur
-                    if chunk:
-                        yield chunk
-                    last_text = cur
-                if state == "final":
+                    break
+
+                # 一次唤醒后把队列中已到达的事件全部取出，连续的片段合并为一次 yield
+                pending: List[str] = []
+                done = False
+                try:
+                    while True:
+                        last_text, chunk, done = _process_chat_event(evt, last_text)
+                        if chunk:
+                            pending.append(chunk)
+                        if done:
+                            break
+                        try:
+                            evt = q.get_nowait()
+                        except queue.Empty:
+                            break
+                except (GatewayClosedError, ChatFailedError):
+                    if pending:
+                        yield "".join(pending)
+                    raise
+                if pending:
+                    yield "".join(pending)
+                if done:
                     return
 
             raise ChatTimeoutError("Chat timeout")
@@ -649,31 +1318,44 @@ class OpenClawChatWsAdapter:
             完整的 assistant 响应文本。
         """
 
-        parts: List[str] = []
+        # 片段直接写入同一个 StringIO 缓冲区，避免长回复时累积大量小字符串
+        buf = io.StringIO()
         for chunk in self.stream_chat(user_request, timeout_s=timeout_s):
-            parts.append(chunk)
-        return "".join(parts)
+            buf.write(chunk)
+        return buf.getvalue()
 
     def _send(self, obj: Dict[str, Any]) -> None:
         """通过 WebSocket 发送一个 JSON 帧。"""
 
+        self._send_raw(_json_dumps(obj))
+
+    def _send_raw(self, data: Union[str, bytes]) -> None:
+        """通过 WebSocket 发送已序列化的 JSON 文本。"""
+
         if self._ws is None:
             raise RuntimeError("WebSocket not started")
-        self._ws.send(json.dumps(obj, ensure_ascii=False))
+        # websocket-client 默认以 TEXT opcode 发送，bytes 负载会原样作为 UTF-8 文本帧发出
+        self._ws.send(data)
 
     def _default_ws_factory(self, url: str, **kwargs: Any) -> Any:
         """创建一个 websocket-client 的 WebSocketApp 实例。"""
 
-        try:
-            import websocket  # type: ignore
-        except Exception as e:  # pragma: no cover
-            raise RuntimeError("Missing dependency: websocket-client") from e
-        return websocket.WebSocketApp(url, **kwargs)
+        if _websocket_mod is None:  # pragma: no cover
+            raise RuntimeError("Missing dependency: websocket-client")
+        return _websocket_mod.WebSocketApp(url, **kwargs)
 
     def _on_open(self, _ws: Any) -> None:
         """处理 on_open 回调并调度一次兜底 connect 请求。"""
 
-        threading.Timer(self._settings.connect_fallback_delay_s, self._send_connect).start()
+        self._connect_fallback = _DELAYED_CALLS.enter(self._settings.connect_fallback_delay_s, self._send_connect)
+
+    def _cancel_connect_fallback(self) -> None:
+        """取消尚未触发的兜底 connect 调度。"""
+
+        fallback = self._connect_fallback
+        if fallback is not None:
+            self._connect_fallback = None
+            _DELAYED_CALLS.cancel(fallback)
 
     def _send_connect(self) -> None:
         """发送一次 connect 握手请求（只发送一次）。"""
@@ -683,71 +1365,44 @@ class OpenClawChatWsAdapter:
         self._connect_sent = True
         self._connect_req_id = _uuid()
 
-        params: Dict[str, Any] = {
-            "minProtocol": self._settings.protocol_version,
-            "maxProtocol": self._settings.protocol_version,
-            "client": {
-                "id": self._settings.client_id,
-                "displayName": self._settings.client_display_name,
-                "version": self._settings.client_version,
-                "platform": self._settings.platform,
-                "mode": self._settings.client_mode,
-                "instanceId": self._settings.instance_id or f"py-{_uuid()}",
-            },
-            "role": self._settings.role,
-            "scopes": [s.strip() for s in self._settings.scopes_csv.split(",") if s.strip()],
-        }
+        params = _build_connect_params(self._settings, self._device, self._connect_nonce, self._instance_id)
 
-        auth: Dict[str, Any] = {}
-        if self._settings.token:
-            auth["token"] = self._settings.token
-        if self._settings.password:
-            auth["password"] = self._settings.password
-        if auth:
-            params["auth"] = auth
-
-        if self._device is not None:
-            signed_at = int(time.time() * 1000)
-            nonce = self._connect_nonce or ""
-            
-            # 这里的参数必须和 connect.params 里的完全一致！
-            # 格式: version|deviceId|clientId|clientMode|role|scopes|signedAtMs|token|nonce
-            scopes_str = ",".join(params["scopes"])
-            token_val = self._settings.token or ""
-            
-            payload = (
-                f"v2|{self._device.device_id}|{self._settings.client_id}|"
-                f"{self._settings.client_mode}|{self._settings.role}|"
-                f"{scopes_str}|{signed_at}|{token_val}|{nonce}"
-            )
+        frame = _req_frame(self._connect_req_id, "connect", params)
+        self._send(frame)
 
-            print(f":payload {payload}")
+    def _on_message(self, ws: Any, message: Union[str, bytes]) -> None:
+        """在 ws 读线程上只做入队，尽快返回以便继续读取 socket。
 
-            signature = self._device.sign_payload(payload)
-            
-            print(f"connect signature: {signature}")
+        默认工厂以 skip_utf8_validation=True 运行，TEXT 帧以未解码的 bytes 到达，
+        由 _json_loads 直接解析；注入的工厂仍可传入 str。
+        """
 
-            params["device"] = {
-                "id": self._device.device_id,
-                "publicKey": self._device.public_key_b64,
-                "signature": signature,
-                "signedAt": signed_at,
-                "nonce": nonce,
-            }
+        if ws is self._ws:
+            self._dispatch_q.put(message)
 
-        frame = {"type": "req", "id": self._connect_req_id, "method": "connect", "params": params}
-        self._send(frame)
+    def _run_dispatch(self, q: "queue.SimpleQueue[Any]") -> None:
+        """分发线程主循环：按到达顺序处理入站消息，直到收到关闭标记。
 
-    def _on_message(self, _ws: Any, message: str) -> None:
-        """将入站帧分发到握手、等待中的 RPC 或 chat 流队列。"""
-        try:
-            frame = json.loads(message)
-            print(f"message: {frame}")
-            print(f"*" * 10)
+        Args:
+            q: 本次 start() 创建的分发队列。
+        """
 
-        except Exception:
-            return
-        if not isinstance(frame, dict):
+        while True:
+            message = q.get()
+            if message is _DISPATCH_CLOSED:
+                # stop() 后立即重新 start() 时，旧分发线程不得把新连接标记为关闭
+                if q is self._dispatch_q:
+                    self._mark_closed()
+                return
+            try:
+                self._dispatch_message(message)
+            except Exception:
+                _logger.debug("处理入站帧失败", exc_info=True)
+
+    def _dispatch_message(self, message: Union[str, bytes]) -> None:
+        """将入站帧分发到握手、等待中的 RPC 或 chat 流队列。"""
+        frame = _decode_frame(message)
+        if frame is None:
             return
 
         t = frame.get("type")
@@ -762,57 +1417,74 @@ class OpenClawChatWsAdapter:
         """处理来自网关的 event 帧。"""
 
         event = frame.get("event")
-        if event == "connect.challenge":
-            payload = frame.get("payload") or {}
-            nonce = payload.get("nonce") if isinstance(payload, dict) else None
-            self._connect_nonce = nonce if isinstance(nonce, str) else None
-            self._send_connect()
+        if event == "chat":
+            routed = _route_chat_event(frame, self._chat_queues)
+            if routed is not None:
+                routed[0].put(routed[1])
             return
 
-        if event == "chat":
-            payload = frame.get("payload")
-            if not isinstance(payload, dict):
-                return
-            run_id = payload.get("runId")
-            if not isinstance(run_id, str):
-                return
-            with self._chat_lock:
-                q = self._chat_queues.get(run_id)
-            if q is not None:
-                q.put(payload)
+        if event == "connect.challenge":
+            self._connect_nonce = _challenge_nonce(frame)
+            self._cancel_connect_fallback()
+            self._send_connect()
             return
 
     def _handle_res_frame(self, frame: Dict[str, Any]) -> None:
         """处理 response 帧并唤醒对应的等待者。"""
 
         req_id = frame.get("id")
-        if isinstance(req_id, str):
-            with self._pending_lock:
-                q = self._pending.get(req_id)
-            if q is not None:
-                q.put(frame)
+        try:
+            waiter = self._pending.get(req_id)
+        except TypeError:
+            # id 不可哈希（畸形帧），不可能对应任何等待者
+            waiter = None
+        if waiter is not None:
+            waiter.result = frame
+            waiter.event.set()
+            return
 
-        payload = frame.get("payload")
-        if (isinstance(payload, dict) and payload.get("type") == "hello-ok") or \
-           (req_id == self._connect_req_id and frame.get("ok") is True):
-            _logger.debug("收到 hello-ok，握手完成。")
-            self._hello_payload = payload
-            self._hello_ok.set()
-            print(f"hello-ok: {frame}")
+        # 握手完成后不会再有 hello-ok，普通 RPC 响应到此即可返回
+        if self._hello_ok.is_set():
             return
 
-        if req_id and req_id == self._connect_req_id and frame.get("ok") is False:
-            err = frame.get("error") or {}
-            msg = err.get("message") if isinstance(err, dict) else None
-            self._last_error = ProtocolError(msg or "Connect failed")
+        outcome = _handshake_outcome(frame, self._connect_req_id)
+        if outcome is None:
             return
+        payload, error = outcome
+        if error is None:
+            _logger.debug("收到 hello-ok，握手完成。")
+            self._hello_payload = payload
+            self._hello_ok.set()
+        else:
+            self._last_error = error
+        self._handshake_done.set()
 
-    def _on_error(self, _ws: Any, error: Any) -> None:
+    def _on_error(self, ws: Any, error: Any) -> None:
         """记录 WebSocket 错误，供 start() 与 request() 的等待逻辑使用。"""
 
+        if ws is not self._ws:
+            return
         self._last_error = error if isinstance(error, BaseException) else RuntimeError(str(error))
 
-    def _on_close(self, _ws: Any, close_status_code: Any, close_msg: Any) -> None:
-        """在 WebSocket 关闭时标记适配器已关闭。"""
+    def _on_close(self, ws: Any, close_status_code: Any, close_msg: Any) -> None:
+        """在 WebSocket 关闭时通知分发线程；其处理完已入队的帧后再标记关闭。
+
+        只处理当前连接的回调：stop() 后重新 start() 时，旧 WebSocketApp
+        迟到的 on_close 不会关闭新连接。
+        """
+
+        if ws is self._ws:
+            self._dispatch_q.put(_DISPATCH_CLOSED)
+
+    def _mark_closed(self) -> None:
+        """标记连接已关闭，并唤醒等待握手的 start()、等待中的 RPC 与所有进行中的 stream_chat。"""
 
         self._closed.set()
+        self._handshake_done.set()
+        # 未收到响应的 RPC 以 result=None 唤醒，由 request() 转为 GatewayClosedError
+        with self._pending_lock:
+            for waiter in self._pending.values():
+                waiter.event.set()
+        with self._chat_lock:
+            for q in self._chat_queues.values():
+                q.put(_CLOSED_SENTINEL)
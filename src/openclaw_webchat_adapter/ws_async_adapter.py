@@ -0,0 +1,490 @@
+"""基于 asyncio 实现 OpenClaw Gateway 协议的 WebSocket 适配器。"""
+
+from __future__ import annotations
+
+import asyncio
+import io
+import logging
+from typing import Any, AsyncIterator, Callable, Dict, Optional, Tuple, Type, Union
+
+try:
+    from websockets.exceptions import ConnectionClosed as _WsConnectionClosed  # type: ignore
+except ImportError:  # pragma: no cover
+    _WsConnectionClosed = None
+
+from .config import AdapterSettings
+from .exceptions import (
+    ChatTimeoutError,
+    GatewayClosedError,
+    RequestTimeoutError,
+    ResourceLimitError,
+)
+from .ws_adapter import (
+    _CLOSED_SENTINEL,
+    DeviceIdentity,
+    _build_connect_params,
+    _challenge_nonce,
+    _decode_frame,
+    _encode_req_frame,
+    _handshake_outcome,
+    _json_dumps,
+    _process_chat_event,
+    _req_frame,
+    _route_chat_event,
+    _rpc_result,
+    _uuid,
+    _validate_request_args,
+)
+
+_logger = logging.getLogger(__name__)
+
+# 发送时连接已被对端关闭、读取协程尚未察觉时 websockets 抛出的异常；未安装 websockets 时为空元组
+_CONNECTION_CLOSED_ERRORS: Tuple[Type[BaseException], ...] = (
+    (_WsConnectionClosed,) if _WsConnectionClosed is not None else ()
+)
+
+ConnectFactory = Callable[[str], Any]
+
+
+class OpenClawChatAsyncWsAdapter:
+    """在 asyncio 事件循环中连接 OpenClaw Gateway，并提供流式聊天 API。
+
+    读取协程 `_reader` 独占连接的接收端，将 response 帧直接投递到等待中的
+    `asyncio.Future`，将 chat event 投递到对应 runId 的 `asyncio.Queue`；
+    整个过程运行在单个事件循环线程内，无需线程切换与锁。
+    """
+
+    def __init__(
+            self,
+            settings: AdapterSettings,
+            device: Optional[DeviceIdentity] = None,
+            connect_factory: Optional[ConnectFactory] = None,
+    ):
+        """初始化适配器并准备握手相关状态。
+
+        Args:
+            settings: 连接与握手配置。
+            device: 可选的设备身份信息，用于签名式 connect。
+            connect_factory: 可选的连接工厂，接收 url 并返回可 await 的连接对象，
+                用于测试/依赖注入；连接对象需提供 send/recv/close 协程。
+        """
+
+        self._settings = settings
+        self._device = device
+        # 未配置 instance_id 时只生成一次，重连时沿用同一实例标识
+        self._instance_id = settings.instance_id or f"py-{_uuid()}"
+        self._connect_factory = connect_factory or self._default_connect_factory
+        # 默认的 websockets 连接支持 recv(decode=False) 与 send(bytes, text=True)，
+        # TEXT 帧在收发两端都以 UTF-8 bytes 处理，无需 str 编解码
+        self._raw_frames = connect_factory is None
+
+        self._ws: Optional[Any] = None
+        self._reader_task: Optional["asyncio.Task[None]"] = None
+        self._fallback_handle: Optional[asyncio.TimerHandle] = None
+        self._connect_task: Optional["asyncio.Task[None]"] = None
+        self._closed = asyncio.Event()
+        self._hello_ok = asyncio.Event()
+        # hello-ok、connect 失败或连接关闭任一发生时置位，供 start() 单次等待。
+        self._handshake_done = asyncio.Event()
+        self._hello_payload: Optional[Dict[str, Any]] = None
+        self._connect_nonce: Optional[str] = None
+        self._connect_sent = False
+        self._connect_req_id: Optional[str] = None
+        # connect 被网关拒绝时的错误；连接关闭的原因单独记在 _close_cause，由 start() 转为 GatewayClosedError
+        self._last_error: Optional[BaseException] = None
+        self._close_cause: Optional[BaseException] = None
+
+        # 资源限制常量
+        self._MAX_PENDING_REQUESTS = 100
+        self._MAX_CHAT_SESSIONS = 50
+
+        self._pending: Dict[str, "asyncio.Future[Dict[str, Any]]"] = {}
+        self._chat_queues: Dict[str, "asyncio.Queue[Dict[str, Any]]"] = {}
+
+    @classmethod
+    async def create_connected(
+            cls,
+            settings: AdapterSettings,
+            ensure_session_key: str = "main",
+            timeout_s: float = 12.0,
+            device: Optional[DeviceIdentity] = None,
+            connect_factory: Optional[ConnectFactory] = None,
+    ) -> "OpenClawChatAsyncWsAdapter":
+        """创建适配器实例并在返回前完成握手与会话准备。
+
+        Args:
+            settings: 连接与握手配置。
+            ensure_session_key: 启动后用于 sessions.patch 的会话 key。
+            timeout_s: 等待 hello-ok 的最大秒数。
+            device: 可选的设备身份信息，用于签名式 connect。
+            connect_factory: 可选的连接工厂，用于测试/依赖注入。
+
+        Returns:
+            已完成握手并确保会话可发送的适配器实例。
+        """
+
+        adapter = cls(settings=settings, device=device, connect_factory=connect_factory)
+        hello = await adapter.start(timeout_s=timeout_s)
+        server = hello.get("server") if isinstance(hello, dict) else None
+        conn_id = server.get("connId") if isinstance(server, dict) else None
+        protocol = hello.get("protocol") if isinstance(hello, dict) else None
+        log_info = _logger.isEnabledFor(logging.INFO)
+        if log_info:
+            _logger.info("已连接 OpenClaw Gateway：url=%s protocol=%s connId=%s", settings.url, protocol, conn_id)
+        await adapter.ensure_session(ensure_session_key)
+        if log_info:
+            _logger.info("会话已就绪：session=%s sendPolicy=allow", ensure_session_key)
+        return adapter
+
+    @property
+    def hello_payload(self) -> Optional[Dict[str, Any]]:
+        """在 start() 成功后返回 hello-ok 的 payload。"""
+
+        return self._hello_payload
+
+    async def start(self, timeout_s: float = 12.0) -> Dict[str, Any]:
+        """建立 WebSocket 连接并等待握手完成。
+
+        Args:
+            timeout_s: 等待 hello-ok 的最大秒数。
+
+        Returns:
+            hello-ok 的 payload 字典。
+
+        Raises:
+            GatewayClosedError: 当握手完成前网关连接被关闭时抛出。
+            RequestTimeoutError: 当超时仍未收到 hello-ok 时抛出。
+            RuntimeError: 当 start() 被重复调用或底层 WS 出错时抛出。
+        """
+
+        if self._ws is not None:
+            raise RuntimeError("Adapter already started")
+
+        # 在运行中的事件循环内重建 Event，避免 Python < 3.10 下绑定到错误的 loop。
+        self._closed = asyncio.Event()
+        self._hello_ok = asyncio.Event()
+        self._handshake_done = asyncio.Event()
+        self._hello_payload = None
+        self._connect_nonce = None
+        self._connect_sent = False
+        self._connect_req_id = None
+        self._last_error = None
+        self._close_cause = None
+
+        try:
+            self._ws = await self._connect_factory(self._settings.url)
+        except Exception as e:
+            raise RuntimeError(str(e)) from e
+
+        loop = asyncio.get_running_loop()
+        self._reader_task = loop.create_task(self._reader())
+        self._fallback_handle = loop.call_later(
+            self._settings.connect_fallback_delay_s, self._schedule_send_connect
+        )
+
+        try:
+            await asyncio.wait_for(self._handshake_done.wait(), timeout_s)
+        except asyncio.TimeoutError:
+            pass
+
+        if self._hello_ok.is_set():
+            return self._hello_payload or {}
+        if self._last_error:
+            raise RuntimeError(str(self._last_error))
+        if self._closed.is_set():
+            raise GatewayClosedError("Gateway closed before hello-ok") from self._close_cause
+        raise RequestTimeoutError("Handshake timeout: hello-ok not received")
+
+    async def stop(self) -> None:
+        """关闭 WebSocket 连接并等待读取协程退出（尽力而为）。"""
+
+        if self._ws is None:
+            return
+        ws = self._ws
+        self._ws = None
+        if self._fallback_handle is not None:
+            self._fallback_handle.cancel()
+            self._fallback_handle = None
+        if self._connect_task is not None:
+            self._connect_task.cancel()
+            self._connect_task = None
+        try:
+            await ws.close()
+        finally:
+            self._mark_closed()
+            if self._reader_task is not None:
+                self._reader_task.cancel()
+                try:
+                    await self._reader_task
+                except (asyncio.CancelledError, Exception):
+                    pass
+                self._reader_task = None
+
+    async def request(
+            self, method: str, params: Optional[Dict[str, Any]] = None, timeout_s: float = 15.0
+    ) -> Dict[str, Any]:
+        """发送一次 RPC 请求并等待响应。
+
+        Args:
+            method: RPC 方法名。
+            params: RPC 参数字典。
+            timeout_s: 等待响应的最大秒数。
+
+        Returns:
+            响应 payload 字典。
+
+        Raises:
+            RequestTimeoutError: 当超时仍未收到响应时抛出。
+            RequestFailedError: 当网关返回 ok=false 时抛出。
+            GatewayClosedError: 当网关连接已关闭或在等待期间关闭时抛出。
+            ValueError: 当 method/params 的输入类型不合法时抛出。
+            RuntimeError: 当握手未完成即调用时抛出。
+        """
+
+        # 关闭后 hello_ok 仍保持置位，须先判断，否则请求要等满 timeout_s 才失败
+        if self._closed.is_set():
+            raise GatewayClosedError(f"Gateway closed: {method}")
+        if not self._hello_ok.is_set():
+            raise RuntimeError("Gateway not connected (hello-ok not received)")
+        _validate_request_args(method, params)
+        if len(self._pending) >= self._MAX_PENDING_REQUESTS:
+            raise ResourceLimitError(f"Too many pending requests (max: {self._MAX_PENDING_REQUESTS})")
+
+        req_id = _uuid()
+        fut: "asyncio.Future[Dict[str, Any]]" = asyncio.get_running_loop().create_future()
+        self._pending[req_id] = fut
+        try:
+            await self._send_data(_encode_req_frame(req_id, method, params))
+            res = await asyncio.wait_for(fut, timeout_s)
+        except asyncio.TimeoutError as e:
+            raise RequestTimeoutError(f"Request timeout: {method}") from e
+        except _CONNECTION_CLOSED_ERRORS as e:
+            raise GatewayClosedError(f"Gateway closed: {method}") from e
+        finally:
+            self._pending.pop(req_id, None)
+        return _rpc_result(res)
+
+    async def ensure_session(self, key: str = "main", timeout_s: float = 15.0) -> Dict[str, Any]:
+        """确保指定 session 存在，并按会话策略允许发送聊天。
+
+        Args:
+            key: 需要 patch 的 session key 名称。
+            timeout_s: 等待 RPC 响应的最大秒数。
+
+        Returns:
+            响应 payload 字典。
+        """
+
+        if not isinstance(key, str) or not key.strip():
+            raise ValueError("key must be a non-empty string")
+        return await self.request("sessions.patch", {"key": key, "sendPolicy": "allow"}, timeout_s=timeout_s)
+
+    async def stream_chat(self, user_request: str, timeout_s: float = 120.0) -> AsyncIterator[str]:
+        """针对用户输入流式产出 assistant 的增量文本片段。
+
+        Args:
+            user_request: 作为 chat message 发送的用户文本。
+            timeout_s: 等待对话完成的最大秒数。
+
+        Yields:
+            assistant 的增量文本片段。
+
+        Raises:
+            GatewayClosedError: 当网关连接已关闭或在流式过程中关闭时抛出。
+            ChatTimeoutError: 当对话在超时时间内未完成时抛出。
+            ChatFailedError: 当对话以 error/aborted 状态结束时抛出。
+        """
+
+        if not isinstance(user_request, str) or not user_request.strip():
+            return
+        if self._closed.is_set():
+            raise GatewayClosedError("Gateway closed: chat.send")
+        if len(self._chat_queues) >= self._MAX_CHAT_SESSIONS:
+            raise ResourceLimitError(f"Too many chat sessions (max: {self._MAX_CHAT_SESSIONS})")
+
+        run_id = _uuid()
+        q: "asyncio.Queue[Dict[str, Any]]" = asyncio.Queue()
+        self._chat_queues[run_id] = q
+
+        try:
+            await self.request(
+                "chat.send",
+                {
+                    "sessionKey": self._settings.session_key,
+                    "message": user_request,
+                    "idempotencyKey": run_id,
+                },
+                timeout_s=timeout_s,
+            )
+
+            loop = asyncio.get_running_loop()
+            last_text = ""
+            deadline = loop.time() + timeout_s
+            while True:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    raise ChatTimeoutError("Chat timeout")
+                try:
+                    evt = await asyncio.wait_for(q.get(), remaining)
+                except asyncio.TimeoutError as e:
+                    raise ChatTimeoutError("Chat timeout") from e
+                last_text, chunk, done = _process_chat_event(evt, last_text)
+                if chunk:
+                    yield chunk
+                if done:
+                    return
+        finally:
+            self._chat_queues.pop(run_id, None)
+
+    async def chat(self, user_request: str, timeout_s: float = 120.0) -> str:
+        """通过拼接 stream_chat 的片段返回完整 assistant 响应。
+
+        Args:
+            user_request: 作为 chat message 发送的用户文本。
+            timeout_s: 等待对话完成的最大秒数。
+
+        Returns:
+            完整的 assistant 响应文本。
+        """
+
+        # 片段直接写入同一个 StringIO 缓冲区，避免长回复时累积大量小字符串
+        buf = io.StringIO()
+        async for chunk in self.stream_chat(user_request, timeout_s=timeout_s):
+            buf.write(chunk)
+        return buf.getvalue()
+
+    async def _send(self, obj: Dict[str, Any]) -> None:
+        """通过 WebSocket 发送一个 JSON 帧。"""
+
+        await self._send_data(_json_dumps(obj))
+
+    async def _send_data(self, data: Union[str, bytes]) -> None:
+        """通过 WebSocket 以 TEXT 帧发送已序列化的 JSON 文本。"""
+
+        if self._ws is None:
+            raise RuntimeError("WebSocket not started")
+        if self._raw_frames:
+            await self._ws.send(data, text=True)
+            return
+        # 注入的连接不一定支持 text=True；websockets 类接口会把 bytes 作为 BINARY 帧发送，这里还原为 str
+        await self._ws.send(data.decode("utf-8") if isinstance(data, bytes) else data)
+
+    async def _default_connect_factory(self, url: str) -> Any:
+        """使用 websockets 库建立连接。"""
+
+        try:
+            from websockets.asyncio.client import connect  # type: ignore
+        except Exception as e:  # pragma: no cover
+            raise RuntimeError("Missing dependency: websockets>=14") from e
+        return await connect(url)
+
+    def _schedule_send_connect(self) -> None:
+        """由 call_later 触发的兜底 connect 调度。"""
+
+        self._fallback_handle = None
+        # 保留任务引用：避免任务被垃圾回收，并让 stop() 能够取消尚未完成的发送
+        self._connect_task = asyncio.get_running_loop().create_task(self._send_connect())
+        self._connect_task.add_done_callback(self._on_connect_task_done)
+
+    def _on_connect_task_done(self, task: "asyncio.Task[None]") -> None:
+        """兜底 connect 任务结束时清理引用并取走异常，发送失败由读取协程感知连接关闭。"""
+
+        if self._connect_task is task:
+            self._connect_task = None
+        if not task.cancelled() and task.exception() is not None:
+            _logger.debug("发送兜底 connect 失败", exc_info=task.exception())
+
+    async def _send_connect(self) -> None:
+        """发送一次 connect 握手请求（只发送一次）。"""
+
+        if self._connect_sent or self._ws is None:
+            return
+        self._connect_sent = True
+        self._connect_req_id = _uuid()
+        params = _build_connect_params(self._settings, self._device, self._connect_nonce, self._instance_id)
+        await self._send(_req_frame(self._connect_req_id, "connect", params))
+
+    async def _reader(self) -> None:
+        """持续读取入站帧并分发，直至连接关闭。"""
+
+        ws = self._ws
+        recv_raw = self._raw_frames
+        try:
+            while True:
+                message = await (ws.recv(decode=False) if recv_raw else ws.recv())
+                frame = _decode_frame(message)
+                if frame is None:
+                    continue
+                t = frame.get("type")
+                if t == "event":
+                    await self._handle_event_frame(frame)
+                elif t == "res":
+                    self._handle_res_frame(frame)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            # recv 失败（websockets 的 ConnectionClosed 或注入连接的等价异常）即视为连接关闭，
+            # 不记入 _last_error，调用方看到的是 GatewayClosedError
+            self._close_cause = e
+        finally:
+            self._mark_closed()
+
+    async def _handle_event_frame(self, frame: Dict[str, Any]) -> None:
+        """处理来自网关的 event 帧。"""
+
+        event = frame.get("event")
+        if event == "chat":
+            routed = _route_chat_event(frame, self._chat_queues)
+            if routed is not None:
+                routed[0].put_nowait(routed[1])
+            return
+
+        if event == "connect.challenge":
+            self._connect_nonce = _challenge_nonce(frame)
+            if self._fallback_handle is not None:
+                self._fallback_handle.cancel()
+                self._fallback_handle = None
+            await self._send_connect()
+
+    def _handle_res_frame(self, frame: Dict[str, Any]) -> None:
+        """处理 response 帧并唤醒对应的等待者。"""
+
+        req_id = frame.get("id")
+        try:
+            fut = self._pending.get(req_id)
+        except TypeError:
+            # id 不可哈希（畸形帧），不可能对应任何等待者
+            fut = None
+        if fut is not None:
+            if not fut.done():
+                fut.set_result(frame)
+            return
+
+        # 握手完成后不会再有 hello-ok，普通 RPC 响应到此即可返回
+        if self._hello_ok.is_set():
+            return
+
+        outcome = _handshake_outcome(frame, self._connect_req_id)
+        if outcome is None:
+            return
+        payload, error = outcome
+        if error is None:
+            _logger.debug("收到 hello-ok，握手完成。")
+            self._hello_payload = payload
+            self._hello_ok.set()
+        else:
+            self._last_error = error
+        self._handshake_done.set()
+
+    def _mark_closed(self) -> None:
+        """标记连接已关闭，并唤醒等待握手的 start()、等待中的 RPC 与所有 chat 流。"""
+
+        if self._closed.is_set():
+            return
+        self._closed.set()
+        self._handshake_done.set()
+        for fut in self._pending.values():
+            if not fut.done():
+                fut.set_exception(GatewayClosedError("Gateway closed"))
+        for q in self._chat_queues.values():
+            q.put_nowait(_CLOSED_SENTINEL)
@@ -0,0 +1,108 @@
+"""同步适配器测试共用的假 WebSocketApp，可作为 ws_factory 注入 OpenClawChatWsAdapter。"""
+
+from __future__ import annotations
+
+import re
+from typing import Any, Callable, List, Optional, Tuple, Union
+
+import _helpers  # noqa: F401  将 src 加入 sys.path，须先于包导入
+
+from openclaw_webchat_adapter.ws_adapter import _json_dumps, _json_loads
+
+# 假网关回包在模块加载时序列化为 UTF-8 bytes，send() 中只做 %s 占位替换；
+# 适配器的 _on_message 同时接受 str 与 bytes，直接投递 bytes 省去一次 str 编解码
+_hello = _json_dumps(
+    {
+        "type": "res",
+        "id": "hello-req-id",
+        "ok": True,
+        "payload": {"type": "hello-ok", "protocol": 3, "server": {"connId": "fake-conn"}},
+    }
+)
+HELLO_JSON = _hello if isinstance(_hello, bytes) else _hello.encode("utf-8")
+del _hello
+RES_OK_TEMPLATE = b'{"type":"res","id":"%s","ok":true,"payload":{}}'
+CHAT_REPLY_TEXT = "test response"
+CHAT_FINAL_TEMPLATE = (
+    b'{"type":"event","event":"chat","payload":{"runId":"%s","state":"final",'
+    b'"message":{"content":[{"type":"text","text":"' + CHAT_REPLY_TEXT.encode("utf-8") + b'"}]}}}'
+)
+HISTORY_PAYLOAD_TEMPLATE = (
+    b'{"type":"res","id":"%s","ok":true,"payload":{"sessionKey":"test","sessionId":"test-id",'
+    b'"messages":[{"role":"user","timestamp":0,"content":[{"type":"text","text":"hello"}]}]}}'
+)
+
+# 假网关只关心出站帧的 id / method / params.idempotencyKey，用正则直接从 bytes 中取出，不做完整 JSON 解析
+_FRAME_RE = re.compile(
+    rb'"id"\s*:\s*"([^"]+)".*?"method"\s*:\s*"([^"]+)"(?:.*?"idempotencyKey"\s*:\s*"([^"]+)")?',
+    re.DOTALL,
+)
+
+
+def _encode_field(value: Any) -> Optional[bytes]:
+    return value.encode("utf-8") if isinstance(value, str) else None
+
+
+def _scan_frame(message: Union[str, bytes]) -> Tuple[Optional[bytes], Optional[bytes], Optional[bytes]]:
+    # 安装 orjson 时适配器发出的就是 bytes，可直接匹配；只有 str 帧需要编码一次
+    if isinstance(message, str):
+        message = message.encode("utf-8")
+    m = _FRAME_RE.search(message)
+    if m is not None:
+        return m.group(1), m.group(2), m.group(3)
+    # 正则未命中时回退到完整解析
+    frame = _json_loads(message)
+    params = frame.get("params")
+    run_id = params.get("idempotencyKey") if isinstance(params, dict) else None
+    return _encode_field(frame.get("id")), _encode_field(frame.get("method")), _encode_field(run_id)
+
+
+class FakeWebSocketApp:
+    """模拟 websocket-client 的 WebSocketApp：握手即回 hello-ok，并应答 sessions.patch / chat.send / chat.history。"""
+
+    def __init__(
+        self,
+        url: str,
+        on_open: Optional[Callable[..., Any]] = None,
+        on_message: Optional[Callable[..., Any]] = None,
+        on_error: Optional[Callable[..., Any]] = None,
+        on_close: Optional[Callable[..., Any]] = None,
+    ):
+        self.url = url
+        self._on_open = on_open
+        self._on_message = on_message
+        self._on_error = on_error
+        self._on_close = on_close
+        # 原样保存出站帧，需要时再解析
+        self.sent_messages: List[Union[str, bytes]] = []
+
+    def run_forever(self) -> None:
+        if self._on_open is not None:
+            self._on_open(self)
+        if self._on_message is not None:
+            self._on_message(self, HELLO_JSON)
+        # 适配器只把 run_forever 当作后台线程入口，返回并不代表连接关闭（关闭由 on_close 通知），
+        # 投递 hello-ok 后即可返回，线程随之结束，无需阻塞等待 close()
+
+    def send(self, message: Union[str, bytes]) -> None:
+        self.sent_messages.append(message)
+        req_id, method, run_id = _scan_frame(message)
+        if req_id is None or self._on_message is None:
+            return
+
+        if method == b"sessions.patch":
+            self._on_message(self, RES_OK_TEMPLATE % req_id)
+        elif method == b"chat.send":
+            self._on_message(self, RES_OK_TEMPLATE % req_id)
+            if run_id is not None:
+                self._on_message(self, CHAT_FINAL_TEMPLATE % run_id)
+        elif method == b"chat.history":
+            self._on_message(self, HISTORY_PAYLOAD_TEMPLATE % req_id)
+
+    def close(self) -> None:
+        if self._on_close is not None:
+            self._on_close(self, None, None)
+
+
+def fake_ws_factory(url: str, **kwargs: Any) -> FakeWebSocketApp:
+    return FakeWebSocketApp(url, **kwargs)
@@ -0,0 +1,66 @@
+"""测试模块共用的辅助工具。
+
+导入本模块时会把 src 目录加入 sys.path；各测试模块须在导入 openclaw_webchat_adapter 之前先导入它，
+这样 pytest、`python -m unittest discover -s tests` 与直接运行单个测试文件都能找到包。
+"""
+
+from __future__ import annotations
+
+import contextlib
+import os
+import sys
+from typing import Dict, Iterator, Optional
+
+# 只做字符串拼接，不需要 Path.resolve() 的逐级符号链接解析
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SRC_ROOT = os.path.join(PROJECT_ROOT, "src")
+if SRC_ROOT not in sys.path:
+    sys.path.insert(0, SRC_ROOT)
+
+# create_connected_from_env / AdapterSettings.from_env 需要隔离的 OpenClaw 变量：
+# from_env 读取的全部 key，外加导入时开发者 shell 中已有的其他 OPENCLAW_* 变量
+OPENCLAW_ENV_CLEARED: Dict[str, Optional[str]] = {
+    k: None
+    for k in (
+        "OPENCLAW_GATEWAY_URL",
+        "OPENCLAW_GATEWAY_TOKEN",
+        "OPENCLAW_GATEWAY_PASSWORD",
+        "OPENCLAW_SESSION_KEY",
+        "OPENCLAW_PROTOCOL_VERSION",
+        "OPENCLAW_CLIENT_ID",
+        "OPENCLAW_CLIENT_MODE",
+        "OPENCLAW_CLIENT_DISPLAY_NAME",
+        "OPENCLAW_CLIENT_VERSION",
+        "OPENCLAW_CLIENT_PLATFORM",
+        "OPENCLAW_CLIENT_INSTANCE_ID",
+        "OPENCLAW_CONNECT_ROLE",
+        "OPENCLAW_CONNECT_SCOPES",
+        "OPENCLAW_DEVICE_KEY_FILE",
+        *(k for k in os.environ if k.startswith("OPENCLAW_")),
+    )
+}
+
+
+@contextlib.contextmanager
+def temporary_env(overrides: Dict[str, Optional[str]]) -> Iterator[None]:
+    """临时设置或移除指定的环境变量，退出时只还原这些 key。
+
+    Args:
+        overrides: key 到新值的映射；值为 None 表示移除该变量。
+    """
+
+    old_values: Dict[str, Optional[str]] = {}
+    for k, v in overrides.items():
+        old_values[k] = os.environ.get(k)
+        if v is None:
+            os.environ.pop(k, None)
+        else:
+            os.environ[k] = v
+    try:
+        yield
+    finally:
+        for k, old in old_values.items():
+            if old is None:
+                os.environ.pop(k, None)
+            else:
+                os.environ[k] = old
@@ -1,34 +1,50 @@
 """测试 chat.history 接口的单元测试。"""
 
 import json
-import sys
 import unittest
-from pathlib import Path
-from unittest.mock import patch
-
-PROJECT_ROOT = Path(__file__).resolve().parents[1]
-SRC_ROOT = PROJECT_ROOT / "src"
-if str(SRC_ROOT) not in sys.path:
-    sys.path.insert(0, str(SRC_ROOT))
+from unittest.mock import MagicMock
 
+import _helpers  # noqa: F401  将 src 加入 sys.path，须先于包导入
 from openclaw_webchat_adapter.ws_adapter import OpenClawChatWsAdapter
 from openclaw_webchat_adapter.config import AdapterSettings
 
 
+# 大数据集用例的响应是确定的，模块加载时构造一次；映射过程只读不改
+_ROLES = ("user", "assistant")
+_LARGE_HISTORY_RESPONSE = {
+    "sessionKey": "agent:main:main",
+    "sessionId": "sess-6",
+    "messages": [
+        {"role": _ROLES[i & 1], "content": [{"type": "text", "text": f"Message {i}"}], "timestamp": 1234567890 + i}
+        for i in range(100)
+    ],
+    "thinkingLevel": "off",
+}
+
+
 class TestChatHistory(unittest.TestCase):
     """测试 get_chat_history 方法的各类场景。"""
 
-    def setUp(self):
-        """设置测试环境。"""
-        self.settings = AdapterSettings(
+    @classmethod
+    def setUpClass(cls):
+        """设置测试环境。
+
+        各用例只在实例上临时替换 adapter.request，tearDown 中移除即还原，
+        因此整个类共享同一个 settings/adapter 实例即可。
+        """
+        cls.settings = AdapterSettings(
             url="ws://127.0.0.1:18789",
             session_key="agent:main:main",
             client_id="test-client",
             client_mode="test",
             client_display_name="Test Client",
         )
-        self.adapter = OpenClawChatWsAdapter(settings=self.settings)
-        self.adapter._hello_ok.set()
+        cls.adapter = OpenClawChatWsAdapter(settings=cls.settings)
+        cls.adapter._hello_ok.set()
+
+    def tearDown(self):
+        """移除用例设置的实例属性 request，恢复为类上的方法。"""
+        self.adapter.__dict__.pop("request", None)
 
     def test_get_chat_history_success(self):
         """测试成功获取历史聊天记录。"""
@@ -68,8 +84,8 @@ class TestChatHistory(unittest.TestCase):
             "thinkingLevel": "off",
         }
 
-        with patch.object(self.adapter, "request", return_value=mock_response):
-            result = self.adapter.get_chat_history()
+        self.adapter.request = MagicMock(return_value=mock_response)
+        result = self.adapter.get_chat_history()
 
         self.assertEqual(result.session_key, "agent:main:main")
         self.assertEqual(result.session_id, "sess-1")
@@ -85,10 +101,10 @@ class TestChatHistory(unittest.TestCase):
             "thinkingLevel": "off",
         }
 
-        with patch.object(self.adapter, "request", return_value=mock_response) as mock_request:
-            self.adapter.get_chat_history(
-                session_key="custom:session:test", limit=50
-            )
+        self.adapter.request = mock_request = MagicMock(return_value=mock_response)
+        self.adapter.get_chat_history(
+            session_key="custom:session:test", limit=50
+        )
 
         mock_request.assert_called_once_with(
             "chat.history",
@@ -100,8 +116,8 @@ class TestChatHistory(unittest.TestCase):
         """测试使用默认 session_key。"""
         mock_response = {"sessionKey": "agent:main:main", "sessionId": "sess-3", "messages": [], "thinkingLevel": "off"}
 
-        with patch.object(self.adapter, "request", return_value=mock_response) as mock_request:
-            self.adapter.get_chat_history()
+        self.adapter.request = mock_request = MagicMock(return_value=mock_response)
+        self.adapter.get_chat_history()
 
         mock_request.assert_called_once_with(
             "chat.history",
@@ -113,8 +129,8 @@ class TestChatHistory(unittest.TestCase):
         """测试 session_key 参数为 None 时使用默认值。"""
         mock_response = {"sessionKey": "agent:main:main", "sessionId": "sess-4", "messages": [], "thinkingLevel": "off"}
 
-        with patch.object(self.adapter, "request", return_value=mock_response) as mock_request:
-            self.adapter.get_chat_history(session_key=None)
+        self.adapter.request = mock_request = MagicMock(return_value=mock_response)
+        self.adapter.get_chat_history(session_key=None)
 
         mock_request.assert_called_once_with(
             "chat.history",
@@ -150,26 +166,16 @@ class TestChatHistory(unittest.TestCase):
         """测试返回空消息列表的场景。"""
         mock_response = {"sessionKey": "agent:main:main", "sessionId": "sess-5", "messages": [], "thinkingLevel": "off"}
 
-        with patch.object(self.adapter, "request", return_value=mock_response):
-            result = self.adapter.get_chat_history()
+        self.adapter.request = MagicMock(return_value=mock_response)
+        result = self.adapter.get_chat_history()
 
         self.assertEqual(result.session_key, "agent:main:main")
         self.assertEqual(len(result.messages), 0)
 
     def test_get_chat_history_large_dataset(self):
         """测试大数据集的分页场景。"""
-        messages = [
-            {
-                "role": "user" if i % 2 == 0 else "assistant",
-                "content": [{"type": "text", "text": f"Message {i}"}],
-                "timestamp": 1234567890 + i,
-            }
-            for i in range(100)
-        ]
-        mock_response = {"sessionKey": "agent:main:main", "sessionId": "sess-6", "messages": messages, "thinkingLevel": "off"}
-
-        with patch.object(self.adapter, "request", return_value=mock_response):
-            result = self.adapter.get_chat_history(limit=100)
+        self.adapter.request = MagicMock(return_value=_LARGE_HISTORY_RESPONSE)
+        result = self.adapter.get_chat_history(limit=100)
 
         self.assertEqual(len(result.messages), 100)
         self.assertEqual(result.messages[0].content[0].text, "Message 0")
@@ -179,32 +185,27 @@ class TestChatHistory(unittest.TestCase):
         """测试请求超时场景。"""
         from openclaw_webchat_adapter.exceptions import RequestTimeoutError
 
-        with patch.object(
-            self.adapter, "request", side_effect=RequestTimeoutError("Request timeout")
-        ):
-            with self.assertRaises(RequestTimeoutError):
-                self.adapter.get_chat_history()
+        self.adapter.request = MagicMock(side_effect=RequestTimeoutError("Request timeout"))
+        with self.assertRaises(RequestTimeoutError):
+            self.adapter.get_chat_history()
 
     def test_get_chat_history_request_failed(self):
         """测试网关返回错误场景。"""
         from openclaw_webchat_adapter.exceptions import RequestFailedError
 
-        with patch.object(
-            self.adapter, "request", side_effect=RequestFailedError("Gateway error")
-        ):
-            with self.assertRaises(RequestFailedError):
-                self.adapter.get_chat_history()
+        self.adapter.request = MagicMock(side_effect=RequestFailedError("Gateway error"))
+        with self.assertRaises(RequestFailedError):
+            self.adapter.get_chat_history()
 
     def test_get_chat_history_custom_timeout(self):
         """测试自定义超时时间。"""
         mock_response = {"sessionKey": "agent:main:main", "sessionId": "sess-7", "messages": [], "thinkingLevel": "off"}
 
-        with patch.object(self.adapter, "request", return_value=mock_response) as mock_request:
-            self.adapter.get_chat_history(timeout_s=30.0)
+        self.adapter.request = mock_request = MagicMock(return_value=mock_response)
+        self.adapter.get_chat_history(timeout_s=30.0)
 
         mock_request.assert_called_once()
-        call_args = mock_request.call_args
-        self.assertEqual(call_args[1]["timeout_s"], 30.0)
+        self.assertEqual(mock_request.call_args.kwargs["timeout_s"], 30.0)
 
     def test_get_chat_history_chinese_text_mapping(self):
         """测试中文文本映射。"""
@@ -214,8 +215,8 @@ class TestChatHistory(unittest.TestCase):
             "messages": [{"role": "user", "content": [{"type": "text", "text": "测试中文"}], "timestamp": 1234567890}],
             "thinkingLevel": "off",
         }
-        with patch.object(self.adapter, "request", return_value=mock_response):
-            result = self.adapter.get_chat_history()
+        self.adapter.request = MagicMock(return_value=mock_response)
+        result = self.adapter.get_chat_history()
         self.assertEqual(result.messages[0].content[0].text, "测试中文")
 
 
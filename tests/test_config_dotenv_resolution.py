@@ -4,19 +4,13 @@ from __future__ import annotations
 
 import contextlib
 import os
-import sys
 import tempfile
 import unittest
 from pathlib import Path
-from typing import Dict, Iterator, Optional
+from typing import Iterator
 
+from _helpers import OPENCLAW_ENV_CLEARED, temporary_env
 
-PROJECT_ROOT = Path(__file__).resolve().parents[1]
-SRC_ROOT = PROJECT_ROOT / "src"
-if str(SRC_ROOT) not in sys.path:
-    sys.path.insert(0, str(SRC_ROOT))
-
-import openclaw_webchat_adapter.config as config_mod
 from openclaw_webchat_adapter.config import AdapterSettings, _resolve_dotenv_path
 
 
@@ -30,68 +24,47 @@ def _temporary_working_directory(path: Path) -> Iterator[None]:
         os.chdir(old)
 
 
-@contextlib.contextmanager
-def _temporary_env(overrides: Dict[str, Optional[str]]) -> Iterator[None]:
-    old_values: Dict[str, Optional[str]] = {}
-    for k, v in overrides.items():
-        old_values[k] = os.environ.get(k)
-        if v is None:
-            os.environ.pop(k, None)
-        else:
-            os.environ[k] = v
-    try:
-        yield
-    finally:
-        for k, old in old_values.items():
-            if old is None:
-                os.environ.pop(k, None)
-            else:
-                os.environ[k] = old
+class TestDotenvPathResolution(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        # 两个用例共用同一份临时项目目录：.env 与占位 config.py 只创建一次
+        cls._tempdir = tempfile.TemporaryDirectory()
+        project_root = Path(cls._tempdir.name)
+        (project_root / ".env").write_text("OPENCLAW_GATEWAY_TOKEN=from_dotenv\n", encoding="utf-8")
 
+        fake_config_path = project_root / "src" / "openclaw_webchat_adapter" / "config.py"
+        fake_config_path.parent.mkdir(parents=True, exist_ok=True)
+        fake_config_path.write_text("# placeholder\n", encoding="utf-8")
 
-class TestDotenvPathResolution(unittest.TestCase):
-    def test_resolve_dotenv_from_src_workdir_finds_project_root(self) -> None:
-        with tempfile.TemporaryDirectory() as td:
-            project_root = Path(td)
-            (project_root / ".env").write_text("OPENCLAW_GATEWAY_TOKEN=abc\n", encoding="utf-8")
+        cls._project_root = project_root
+        # 以参数传入伪造的模块路径，不再改写 config_mod.__file__
+        cls._caller_file = str(fake_config_path)
 
-            fake_config_path = project_root / "src" / "openclaw_webchat_adapter" / "config.py"
-            fake_config_path.parent.mkdir(parents=True, exist_ok=True)
-            fake_config_path.write_text("# placeholder\n", encoding="utf-8")
+    @classmethod
+    def tearDownClass(cls) -> None:
+        cls._tempdir.cleanup()
 
-            old_file = getattr(config_mod, "__file__", None)
-            config_mod.__file__ = str(fake_config_path)
-            try:
-                with _temporary_working_directory(project_root / "src"):
-                    resolved = _resolve_dotenv_path(".env")
-                    self.assertEqual(Path(resolved), (project_root / ".env").resolve())
-            finally:
-                if old_file is not None:
-                    config_mod.__file__ = old_file
+    def test_resolve_dotenv_from_src_workdir_finds_project_root(self) -> None:
+        project_root = self._project_root
+        with _temporary_working_directory(project_root / "src"):
+            resolved = _resolve_dotenv_path(".env", caller_file=self._caller_file)
+            self.assertEqual(Path(resolved).resolve(), (project_root / ".env").resolve())
 
-    def test_from_env_loads_dotenv_even_when_cwd_is_src(self) -> None:
+    def test_resolve_dotenv_finds_file_created_after_a_miss(self) -> None:
         with tempfile.TemporaryDirectory() as td:
             project_root = Path(td)
-            (project_root / ".env").write_text("OPENCLAW_GATEWAY_TOKEN=from_dotenv\n", encoding="utf-8")
-
-            fake_config_path = project_root / "src" / "openclaw_webchat_adapter" / "config.py"
-            fake_config_path.parent.mkdir(parents=True, exist_ok=True)
-            fake_config_path.write_text("# placeholder\n", encoding="utf-8")
+            caller_file = str(project_root / "src" / "openclaw_webchat_adapter" / "config.py")
+            (project_root / "src").mkdir()
+            with _temporary_working_directory(project_root / "src"):
+                # 未命中时原样返回，且不应被缓存
+                self.assertEqual(_resolve_dotenv_path(".env", caller_file=caller_file), ".env")
+                (project_root / ".env").write_text("X=1\n", encoding="utf-8")
+                resolved = _resolve_dotenv_path(".env", caller_file=caller_file)
+                self.assertTrue(os.path.isabs(resolved))
+                self.assertEqual(Path(resolved).resolve(), (project_root / ".env").resolve())
 
-            old_file = getattr(config_mod, "__file__", None)
-            config_mod.__file__ = str(fake_config_path)
-            try:
-                with _temporary_env(
-                    {
-                        "OPENCLAW_GATEWAY_TOKEN": None,
-                        "OPENCLAW_GATEWAY_PASSWORD": None,
-                        "OPENCLAW_GATEWAY_URL": None,
-                        "OPENCLAW_SESSION_KEY": None,
-                    }
-                ):
-                    with _temporary_working_directory(project_root / "src"):
-                        settings = AdapterSettings.from_env(dotenv_path=".env")
-                self.assertEqual(settings.token, "from_dotenv")
-            finally:
-                if old_file is not None:
-                    config_mod.__file__ = old_file
+    def test_from_env_loads_dotenv_even_when_cwd_is_src(self) -> None:
+        with temporary_env(OPENCLAW_ENV_CLEARED):
+            with _temporary_working_directory(self._project_root / "src"):
+                settings = AdapterSettings.from_env(dotenv_path=".env", caller_file=self._caller_file)
+        self.assertEqual(settings.token, "from_dotenv")
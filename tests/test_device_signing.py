@@ -1,4 +1,6 @@
 import unittest
+
+import _helpers  # noqa: F401  将 src 加入 sys.path，须先于包导入
 from openclaw_webchat_adapter.ws_adapter import DeviceIdentity, OpenClawChatWsAdapter
 from openclaw_webchat_adapter.config import AdapterSettings
 from cryptography.hazmat.primitives.asymmetric import ed25519
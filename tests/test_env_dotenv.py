@@ -2,39 +2,14 @@
 
 from __future__ import annotations
 
-import contextlib
 import os
-import sys
 import tempfile
 import unittest
 from pathlib import Path
-from typing import Dict, Iterator, Optional
-
-PROJECT_ROOT = Path(__file__).resolve().parents[1]
-SRC_ROOT = PROJECT_ROOT / "src"
-if str(SRC_ROOT) not in sys.path:
-    sys.path.insert(0, str(SRC_ROOT))
-
-from openclaw_webchat_adapter.env import load_dotenv, parse_dotenv_text
-
-
-@contextlib.contextmanager
-def _temporary_env(overrides: Dict[str, Optional[str]]) -> Iterator[None]:
-    old_values: Dict[str, Optional[str]] = {}
-    for k, v in overrides.items():
-        old_values[k] = os.environ.get(k)
-        if v is None:
-            os.environ.pop(k, None)
-        else:
-            os.environ[k] = v
-    try:
-        yield
-    finally:
-        for k, old in old_values.items():
-            if old is None:
-                os.environ.pop(k, None)
-            else:
-                os.environ[k] = old
+
+from _helpers import temporary_env
+
+from openclaw_webchat_adapter.env import load_dotenv, load_dotenv_from_mapping, parse_dotenv_text
 
 
 class TestParseDotenvText(unittest.TestCase):
@@ -56,30 +31,108 @@ class TestParseDotenvText(unittest.TestCase):
         self.assertNotIn("INVALID", parsed)
         self.assertNotIn("", parsed)
 
+    def test_parse_accepts_crlf_and_lone_cr_line_endings(self) -> None:
+        parsed = parse_dotenv_text("A=1\r\nB=2\rC='three'\r")
+        self.assertEqual(parsed, {"A": "1", "B": "2", "C": "three"})
+
+    def test_parse_omits_keys_in_existing(self) -> None:
+        parsed = parse_dotenv_text("A=1\nB=2\n", existing={"A"})
+        self.assertEqual(parsed, {"B": "2"})
+
 
 class TestLoadDotenv(unittest.TestCase):
-    def test_load_dotenv_no_override_skips_existing(self) -> None:
+    @classmethod
+    def setUpClass(cls) -> None:
+        # 只有读文件的用例需要落盘，合并逻辑的用例直接走 load_dotenv_from_mapping
+        cls._tempdir = tempfile.TemporaryDirectory()
+        cls._env_path = Path(cls._tempdir.name) / ".env"
+        cls._env_path.write_text("X=from_dotenv\nY=2\n", encoding="utf-8")
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        cls._tempdir.cleanup()
+
+    def test_load_dotenv_reads_file_and_reports_source(self) -> None:
+        with temporary_env({"X": "from_env", "Y": None}):
+            result = load_dotenv(path=str(self._env_path), override=False)
+            self.assertIsNotNone(result)
+            self.assertEqual(os.environ.get("X"), "from_env")
+            self.assertEqual(os.environ.get("Y"), "2")
+            self.assertEqual(result.source_path, str(self._env_path))
+            self.assertEqual(result.loaded_count, 1)
+            self.assertEqual(result.skipped_count, 1)
+
+    def test_load_dotenv_reads_file_with_lone_cr_line_endings(self) -> None:
         with tempfile.TemporaryDirectory() as td:
             env_path = Path(td) / ".env"
-            env_path.write_text("X=from_dotenv\nY=2\n", encoding="utf-8")
-
-            with _temporary_env({"X": "from_env", "Y": None}):
-                result = load_dotenv(path=str(env_path), override=False)
-                self.assertIsNotNone(result)
-                self.assertEqual(os.environ.get("X"), "from_env")
-                self.assertEqual(os.environ.get("Y"), "2")
-                self.assertEqual(result.source_path, str(env_path))
-                self.assertEqual(result.loaded_count, 1)
-                self.assertEqual(result.skipped_count, 1)
+            env_path.write_bytes(b"CR_A=1\rCR_B=2\r")
+            with temporary_env({"CR_A": None, "CR_B": None}):
+                result = load_dotenv(path=str(env_path))
+                self.assertEqual(result.loaded_count, 2)
+                self.assertEqual(os.environ.get("CR_A"), "1")
+                self.assertEqual(os.environ.get("CR_B"), "2")
 
-    def test_load_dotenv_override_overwrites(self) -> None:
+    def test_load_dotenv_rereads_file_rewritten_with_same_size(self) -> None:
         with tempfile.TemporaryDirectory() as td:
             env_path = Path(td) / ".env"
-            env_path.write_text("X=from_dotenv\n", encoding="utf-8")
-
-            with _temporary_env({"X": "from_env"}):
-                result = load_dotenv(path=str(env_path), override=True)
-                self.assertIsNotNone(result)
-                self.assertEqual(os.environ.get("X"), "from_dotenv")
-                self.assertEqual(result.loaded_count, 1)
-                self.assertEqual(result.skipped_count, 0)
+            env_path.write_text("SAME_SIZE=aaa\n", encoding="utf-8")
+            with temporary_env({"SAME_SIZE": None}):
+                load_dotenv(path=str(env_path), override=True)
+                self.assertEqual(os.environ.get("SAME_SIZE"), "aaa")
+
+                # 大小不变，仅 mtime_ns 变化，缓存也必须失效
+                st = env_path.stat()
+                env_path.write_text("SAME_SIZE=bbb\n", encoding="utf-8")
+                os.utime(env_path, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000))
+                load_dotenv(path=str(env_path), override=True)
+                self.assertEqual(os.environ.get("SAME_SIZE"), "bbb")
+
+    def test_load_dotenv_relative_path_follows_cwd(self) -> None:
+        cwd = os.getcwd()
+        with tempfile.TemporaryDirectory() as td_a, tempfile.TemporaryDirectory() as td_b:
+            path_a = Path(td_a) / ".env"
+            path_b = Path(td_b) / ".env"
+            path_a.write_text("REL_KEY=aaa\n", encoding="utf-8")
+            path_b.write_text("REL_KEY=bbb\n", encoding="utf-8")
+            # 大小与 mtime 都相同，只有按绝对路径缓存才能区分两个文件
+            st = path_a.stat()
+            os.utime(path_b, ns=(st.st_atime_ns, st.st_mtime_ns))
+            try:
+                with temporary_env({"REL_KEY": None}):
+                    os.chdir(td_a)
+                    load_dotenv(path=".env", override=True)
+                    self.assertEqual(os.environ.get("REL_KEY"), "aaa")
+                    os.chdir(td_b)
+                    load_dotenv(path=".env", override=True)
+                    self.assertEqual(os.environ.get("REL_KEY"), "bbb")
+            finally:
+                os.chdir(cwd)
+
+    def test_load_dotenv_cached_text_skips_keys_set_after_first_load(self) -> None:
+        with temporary_env({"X": None, "Y": None}):
+            first = load_dotenv(path=str(self._env_path))
+            self.assertEqual(first.loaded_count, 2)
+
+            # 命中缓存时仍按当次的 os.environ 判断已存在的 key
+            os.environ["X"] = "changed"
+            del os.environ["Y"]
+            second = load_dotenv(path=str(self._env_path))
+            self.assertEqual(os.environ.get("X"), "changed")
+            self.assertEqual(os.environ.get("Y"), "2")
+            self.assertEqual(second.loaded_count, 1)
+            self.assertEqual(second.skipped_count, 1)
+
+    def test_load_dotenv_no_override_skips_existing(self) -> None:
+        with temporary_env({"X": "from_env", "Y": None}):
+            result = load_dotenv_from_mapping({"X": "from_dotenv", "Y": "2"}, override=False)
+            self.assertEqual(os.environ.get("X"), "from_env")
+            self.assertEqual(os.environ.get("Y"), "2")
+            self.assertEqual(result.loaded_count, 1)
+            self.assertEqual(result.skipped_count, 1)
+
+    def test_load_dotenv_override_overwrites(self) -> None:
+        with temporary_env({"X": "from_env"}):
+            result = load_dotenv_from_mapping({"X": "from_dotenv"}, override=True)
+            self.assertEqual(os.environ.get("X"), "from_dotenv")
+            self.assertEqual(result.loaded_count, 1)
+            self.assertEqual(result.skipped_count, 0)
@@ -2,190 +2,274 @@
 
 from __future__ import annotations
 
-import json
-import os
-import sys
+import contextlib
 import tempfile
 import threading
 import time
 import unittest
 from pathlib import Path
-from typing import Any, Callable, Dict, Optional
-from unittest.mock import patch
+from typing import Any, Dict, Optional
+from unittest import mock
 
-PROJECT_ROOT = Path(__file__).resolve().parents[1]
-SRC_ROOT = PROJECT_ROOT / "src"
-if str(SRC_ROOT) not in sys.path:
-    sys.path.insert(0, str(SRC_ROOT))
+from _fake_ws import FakeWebSocketApp, fake_ws_factory
+from _helpers import OPENCLAW_ENV_CLEARED, temporary_env
 
 from openclaw_webchat_adapter.config import AdapterSettings
-from openclaw_webchat_adapter.exceptions import ConfigurationError
-from openclaw_webchat_adapter.ws_adapter import OpenClawChatWsAdapter
-
-
-class _FakeWebSocketApp:
-    def __init__(
-        self,
-        url: str,
-        on_open: Optional[Callable[..., Any]] = None,
-        on_message: Optional[Callable[..., Any]] = None,
-        on_error: Optional[Callable[..., Any]] = None,
-        on_close: Optional[Callable[..., Any]] = None,
-    ):
-        self.url = url
-        self._on_open = on_open
-        self._on_message = on_message
-        self._on_error = on_error
-        self._on_close = on_close
-        self._closed = threading.Event()
-        self.sent_frames: "list[Dict[str, Any]]" = []
+from openclaw_webchat_adapter.exceptions import ConfigurationError, GatewayClosedError
+from openclaw_webchat_adapter.ws_adapter import _ADAPTER_CACHE, OpenClawChatWsAdapter, _close_cached_adapters
 
+
+class _ClosingWebSocketApp(FakeWebSocketApp):
     def run_forever(self) -> None:
-        if self._on_open is not None:
-            self._on_open(self)
-        if self._on_message is not None:
-            hello = {
-                "type": "res",
-                "id": "hello-req-id",
-                "ok": True,
-                "payload": {"type": "hello-ok", "protocol": 3, "server": {"connId": "fake-conn"}},
-            }
-            self._on_message(self, json.dumps(hello, ensure_ascii=False))
-        while not self._closed.is_set():
-            time.sleep(0.01)
-
-    def send(self, message: str) -> None:
-        frame = json.loads(message)
-        self.sent_frames.append(frame)
-        if frame.get("type") != "req":
-            return
-        req_id = frame.get("id")
-        method = frame.get("method")
-        if not isinstance(req_id, str):
-            return
-        if self._on_message is None:
-            return
-        if method == "sessions.patch":
-            res = {"type": "res", "id": req_id, "ok": True, "payload": {}}
-            self._on_message(self, json.dumps(res, ensure_ascii=False))
-            return
-
-        if method == "chat.send":
-            res = {"type": "res", "id": req_id, "ok": True, "payload": {}}
-            self._on_message(self, json.dumps(res, ensure_ascii=False))
-            params = frame.get("params") or {}
-            run_id = params.get("idempotencyKey") if isinstance(params, dict) else None
-            if isinstance(run_id, str):
-                evt = {
-                    "type": "event",
-                    "event": "chat",
-                    "payload": {
-                        "runId": run_id,
-                        "state": "final",
-                        "message": {"content": [{"type": "text", "text": "ok"}]},
-                    },
-                }
-                self._on_message(self, json.dumps(evt, ensure_ascii=False))
-            return
-
-    def close(self) -> None:
-        self._closed.set()
         if self._on_close is not None:
-            self._on_close(self, None, None)
+            self._on_close(self, 1006, "refused")
 
 
-def _fake_ws_factory(url: str, **kwargs: Any) -> _FakeWebSocketApp:
-    return _FakeWebSocketApp(url, **kwargs)
+class _ClosesAfterFirstCheck(threading.Event):
+    def __init__(self) -> None:
+        super().__init__()
+        self._checks = 0
 
+    def is_set(self) -> bool:
+        self._checks += 1
+        return self._checks > 1 or super().is_set()
 
-class TestCreateConnected(unittest.TestCase):
-    def test_create_connected_performs_handshake_and_ensures_session(self) -> None:
+
+# 各 .env 变体写在同一个临时目录中，整个模块只创建/清理一次
+_DOTENV_FILES = {
+    "env_basic": "\n".join(
+        [
+            "OPENCLAW_GATEWAY_URL=ws://from-dotenv",
+            "OPENCLAW_GATEWAY_TOKEN=dotenv-token",
+            "OPENCLAW_SESSION_KEY=agent:main:main",
+            "",
+        ]
+    ),
+    "env_no_auth": "OPENCLAW_GATEWAY_URL=ws://no-auth\nOPENCLAW_SESSION_KEY=agent:main:main",
+    "env_overrides": "\n".join(
+        [
+            "OPENCLAW_GATEWAY_URL=ws://ignored-dotenv",
+            "OPENCLAW_GATEWAY_TOKEN=dotenv-token",
+            "OPENCLAW_GATEWAY_PASSWORD=dotenv-pass",
+            "OPENCLAW_SESSION_KEY=agent:main:main",
+            "",
+        ]
+    ),
+}
+_module_stack = contextlib.ExitStack()
+_dotenv_dir: Optional[Path] = None
+
+
+def setUpModule() -> None:
+    global _dotenv_dir
+    _dotenv_dir = Path(_module_stack.enter_context(tempfile.TemporaryDirectory()))
+    for name, text in _DOTENV_FILES.items():
+        (_dotenv_dir / name).write_text(text, encoding="utf-8")
+
+
+def tearDownModule() -> None:
+    _module_stack.close()
+
+
+def _dotenv_file(name: str) -> str:
+    assert _dotenv_dir is not None
+    return str(_dotenv_dir / name)
+
+
+def _isolated_env() -> Dict[str, Optional[str]]:
+    # 清空全部 OPENCLAW_* 变量，并把自动生成的设备私钥写进模块临时目录而非 CWD
+    return {**OPENCLAW_ENV_CLEARED, "OPENCLAW_DEVICE_KEY_FILE": _dotenv_file("device.key")}
+
+
+class TestCreateConnectedHandshake(unittest.TestCase):
+    """同一组 settings 的只读断言共用一个已连接的适配器。"""
+
+    @classmethod
+    def setUpClass(cls) -> None:
         settings = AdapterSettings(url="ws://example", session_key="agent:main:main")
-        adapter = OpenClawChatWsAdapter.create_connected(
+        cls.adapter = OpenClawChatWsAdapter.create_connected(
             settings=settings,
             ensure_session_key="main",
             timeout_s=2.0,
-            ws_factory=_fake_ws_factory,
+            ws_factory=fake_ws_factory,
         )
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        cls.adapter.stop()
+
+    def test_create_connected_performs_handshake_and_ensures_session(self) -> None:
+        self.assertIsInstance(self.adapter.hello_payload, dict)
+        self.assertEqual(self.adapter.hello_payload.get("type"), "hello-ok")
+
+
+class TestCreateConnectedFromDotenv(unittest.TestCase):
+    """从 .env 建立的连接只创建一次，供只读断言共用。"""
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        with temporary_env(_isolated_env()):
+            cls.adapter = OpenClawChatWsAdapter.create_connected_from_env(
+                dotenv_path=_dotenv_file("env_basic"),
+                dotenv_override=True,
+                timeout_s=2.0,
+                ws_factory=fake_ws_factory,
+            )
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        cls.adapter.stop()
+
+    def test_create_connected_from_env_reads_dotenv_and_connects(self) -> None:
+        self.assertEqual(self.adapter._settings.url, "ws://from-dotenv")
+        self.assertIsNotNone(self.adapter._ws)
+        self.assertEqual(self.adapter._ws.url, "ws://from-dotenv")
+
+
+def _connect_with_fake_ws(
+        cls: Any, settings: AdapterSettings, timeout_s: float, device: Any, ws_factory: Any
+) -> OpenClawChatWsAdapter:
+    # 注入 ws_factory 会绕过缓存，因此在缓存之后的连接步骤换上假 WebSocket
+    return cls.create_connected(
+        settings=settings,
+        ensure_session_key=settings.session_key,
+        timeout_s=timeout_s,
+        device=device,
+        ws_factory=fake_ws_factory,
+    )
+
+
+class TestCreateConnectedFromEnvCache(unittest.TestCase):
+    def setUp(self) -> None:
+        stack = contextlib.ExitStack()
+        self.addCleanup(stack.close)
+        stack.enter_context(temporary_env(_isolated_env()))
+        stack.enter_context(
+            mock.patch.object(OpenClawChatWsAdapter, "_connect_from_settings", classmethod(_connect_with_fake_ws))
+        )
+        stack.callback(_close_cached_adapters)
+
+    def _connect(self, **kwargs: Any) -> OpenClawChatWsAdapter:
+        return OpenClawChatWsAdapter.create_connected_from_env(
+            dotenv_path=_dotenv_file("env_basic"), dotenv_override=True, timeout_s=2.0, **kwargs
+        )
+
+    def test_same_settings_share_one_adapter_until_last_stop(self) -> None:
+        first = self._connect()
+        second = self._connect()
+        self.assertIs(first._shared, second._shared)
+
+        first.stop()
+        self.assertFalse(second._closed.is_set())
+        second.request("sessions.patch", {"key": "main"}, timeout_s=2.0)
+
+        second.stop()
+        self.assertTrue(second._closed.is_set())
+        self.assertEqual(len(_ADAPTER_CACHE), 0)
+
+    def test_repeated_stop_from_one_holder_releases_only_once(self) -> None:
+        first = self._connect()
+        second = self._connect()
+
+        # OpenClawWebChatAPI.close() 会再调一次 stop()
+        first.stop()
+        first.stop()
+        self.assertFalse(second._closed.is_set())
+        second.request("sessions.patch", {"key": "main"}, timeout_s=2.0)
+
+    def test_different_password_gets_its_own_adapter(self) -> None:
+        first = self._connect(password="pass-a")
+        second = self._connect(password="pass-b")
+        self.assertIsNot(first._shared, second._shared)
+        self.assertEqual(second._settings.password, "pass-b")
+
+    def test_different_scopes_get_their_own_adapter(self) -> None:
+        with temporary_env({"OPENCLAW_CONNECT_SCOPES": "operator.admin"}):
+            first = self._connect()
+        with temporary_env({"OPENCLAW_CONNECT_SCOPES": "operator.pairing"}):
+            second = self._connect()
+        self.assertIsNot(first._shared, second._shared)
+        self.assertEqual(second._settings.scopes_csv, "operator.pairing")
+
+    def test_closed_adapter_is_evicted_and_reconnected(self) -> None:
+        first = self._connect()
+        first.stop()
+        second = self._connect()
+        self.assertIsNot(first._shared, second._shared)
+        self.assertTrue(second._is_live())
+
+
+class TestCreateConnected(unittest.TestCase):
+    def test_start_fails_fast_when_gateway_closes_before_hello(self) -> None:
+        settings = AdapterSettings(url="ws://example", session_key="agent:main:main")
+        adapter = OpenClawChatWsAdapter(settings=settings, ws_factory=_ClosingWebSocketApp)
+        started = time.monotonic()
+        with self.assertRaises(GatewayClosedError):
+            adapter.start(timeout_s=5.0)
+        self.assertLess(time.monotonic() - started, 1.0)
+
+    def test_late_on_close_from_previous_connection_does_not_close_restarted_adapter(self) -> None:
+        settings = AdapterSettings(url="ws://example", session_key="agent:main:main")
+        adapter = OpenClawChatWsAdapter(settings=settings, ws_factory=fake_ws_factory)
+        adapter.start(timeout_s=2.0)
+        old_ws = adapter._ws
+        adapter.stop()
+        adapter.start(timeout_s=2.0)
         try:
-            self.assertIsInstance(adapter.hello_payload, dict)
-            self.assertEqual(adapter.hello_payload.get("type"), "hello-ok")
+            old_ws._on_close(old_ws, 1006, "late")
+            # 分发队列按到达顺序处理：若迟到的关闭标记进入新队列，这次请求会先被它关闭
+            adapter.request("sessions.patch", {"key": "main"}, timeout_s=2.0)
+            self.assertFalse(adapter._closed.is_set())
         finally:
             adapter.stop()
 
-    def test_create_connected_from_env_reads_dotenv_and_connects(self) -> None:
-        with tempfile.TemporaryDirectory() as temp_dir:
-            dotenv_path = Path(temp_dir) / ".env"
-            dotenv_path.write_text(
-                "\n".join(
-                    [
-                        "OPENCLAW_GATEWAY_URL=ws://from-dotenv",
-                        "OPENCLAW_GATEWAY_TOKEN=dotenv-token",
-                        "OPENCLAW_SESSION_KEY=agent:main:main",
-                        "",
-                    ]
-                ),
-                encoding="utf-8",
-            )
-            with patch.dict(os.environ, {}, clear=True):
-                adapter = OpenClawChatWsAdapter.create_connected_from_env(
-                    dotenv_path=str(dotenv_path),
-                    dotenv_override=True,
-                    timeout_s=2.0,
-                    ws_factory=_fake_ws_factory,
-                )
-                try:
-                    self.assertEqual(adapter._settings.url, "ws://from-dotenv")
-                    self.assertIsNotNone(adapter._ws)
-                    self.assertEqual(adapter._ws.url, "ws://from-dotenv")
-                finally:
-                    adapter.stop()
+    def test_request_closed_between_check_and_registration_raises_gateway_closed(self) -> None:
+        settings = AdapterSettings(url="ws://example", session_key="agent:main:main")
+        adapter = OpenClawChatWsAdapter(settings=settings, ws_factory=fake_ws_factory)
+        adapter.start(timeout_s=2.0)
+        try:
+            # 模拟 _mark_closed 恰好在首次检查之后、注册等待者之前完成
+            adapter._closed = _ClosesAfterFirstCheck()
+            with self.assertRaises(GatewayClosedError):
+                adapter.request("noop", timeout_s=0.5)
+        finally:
+            adapter.stop()
+
+    def test_request_after_stop_raises_gateway_closed_immediately(self) -> None:
+        settings = AdapterSettings(url="ws://example", session_key="agent:main:main")
+        adapter = OpenClawChatWsAdapter(settings=settings, ws_factory=fake_ws_factory)
+        adapter.start(timeout_s=2.0)
+        adapter.stop()
+        started = time.monotonic()
+        with self.assertRaises(GatewayClosedError):
+            adapter.request("sessions.patch", {"key": "main"}, timeout_s=5.0)
+        self.assertLess(time.monotonic() - started, 1.0)
 
     def test_create_connected_from_env_raises_configuration_error_when_auth_missing(self) -> None:
-        with tempfile.TemporaryDirectory() as temp_dir:
-            dotenv_path = Path(temp_dir) / ".env"
-            dotenv_path.write_text(
-                "OPENCLAW_GATEWAY_URL=ws://no-auth\nOPENCLAW_SESSION_KEY=agent:main:main",
-                encoding="utf-8",
-            )
-            with patch.dict(os.environ, {}, clear=True):
-                with self.assertRaises(ConfigurationError):
-                    OpenClawChatWsAdapter.create_connected_from_env(
-                        dotenv_path=str(dotenv_path),
-                        dotenv_override=True,
-                        ws_factory=_fake_ws_factory,
-                    )
+        with temporary_env(_isolated_env()):
+            with self.assertRaises(ConfigurationError):
+                OpenClawChatWsAdapter.create_connected_from_env(
+                    dotenv_path=_dotenv_file("env_no_auth"),
+                    dotenv_override=True,
+                    ws_factory=fake_ws_factory,
+                )
 
     def test_create_connected_from_env_allows_url_token_password_overrides(self) -> None:
-        with tempfile.TemporaryDirectory() as temp_dir:
-            dotenv_path = Path(temp_dir) / ".env"
-            dotenv_path.write_text(
-                "\n".join(
-                    [
-                        "OPENCLAW_GATEWAY_URL=ws://ignored-dotenv",
-                        "OPENCLAW_GATEWAY_TOKEN=dotenv-token",
-                        "OPENCLAW_GATEWAY_PASSWORD=dotenv-pass",
-                        "OPENCLAW_SESSION_KEY=agent:main:main",
-                        "",
-                    ]
-                ),
-                encoding="utf-8",
+        with temporary_env(_isolated_env()):
+            adapter = OpenClawChatWsAdapter.create_connected_from_env(
+                url="ws://override",
+                token="override-token",
+                password="override-pass",
+                dotenv_path=_dotenv_file("env_overrides"),
+                dotenv_override=True,
+                timeout_s=2.0,
+                ws_factory=fake_ws_factory,
             )
-            with patch.dict(os.environ, {}, clear=True):
-                adapter = OpenClawChatWsAdapter.create_connected_from_env(
-                    url="ws://override",
-                    token="override-token",
-                    password="override-pass",
-                    dotenv_path=str(dotenv_path),
-                    dotenv_override=True,
-                    timeout_s=2.0,
-                    ws_factory=_fake_ws_factory,
-                )
-                try:
-                    self.assertEqual(adapter._settings.url, "ws://override")
-                    self.assertEqual(adapter._settings.token, "override-token")
-                    self.assertEqual(adapter._settings.password, "override-pass")
-                    self.assertIsNotNone(adapter._ws)
-                    self.assertEqual(adapter._ws.url, "ws://override")
-                finally:
-                    adapter.stop()
+            try:
+                self.assertEqual(adapter._settings.url, "ws://override")
+                self.assertEqual(adapter._settings.token, "override-token")
+                self.assertEqual(adapter._settings.password, "override-pass")
+                self.assertIsNotNone(adapter._ws)
+                self.assertEqual(adapter._ws.url, "ws://override")
+            finally:
+                adapter.stop()
@@ -0,0 +1,241 @@
+"""Test the asyncio adapter with an injected fake WebSocket connection."""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import time
+import unittest
+from typing import Any, Dict, List
+
+try:
+    from websockets.exceptions import ConnectionClosed
+except ImportError:  # pragma: no cover
+    ConnectionClosed = None
+
+import _helpers  # noqa: F401  将 src 加入 sys.path，须先于包导入
+from openclaw_webchat_adapter.config import AdapterSettings
+from openclaw_webchat_adapter.exceptions import GatewayClosedError
+from openclaw_webchat_adapter.ws_async_adapter import OpenClawChatAsyncWsAdapter
+
+
+class _ConnectionClosed(Exception):
+    pass
+
+
+class _FakeAsyncConnection:
+    def __init__(self, url: str, deltas: "List[str]"):
+        self.url = url
+        self._deltas = deltas
+        self._inbox: "asyncio.Queue[Any]" = asyncio.Queue()
+        self.sent_frames: "List[Dict[str, Any]]" = []
+        hello = {
+            "type": "res",
+            "id": "hello-req-id",
+            "ok": True,
+            "payload": {"type": "hello-ok", "protocol": 3, "server": {"connId": "fake-conn"}},
+        }
+        self._inbox.put_nowait(json.dumps(hello))
+
+    async def recv(self) -> str:
+        message = await self._inbox.get()
+        if message is None:
+            raise _ConnectionClosed()
+        return message
+
+    async def send(self, message: str) -> None:
+        frame = json.loads(message)
+        self.sent_frames.append(frame)
+        req_id = frame.get("id")
+        method = frame.get("method")
+        if method in ("sessions.patch", "chat.send"):
+            self._inbox.put_nowait(json.dumps({"type": "res", "id": req_id, "ok": True, "payload": {}}))
+        if method == "chat.send":
+            run_id = frame["params"]["idempotencyKey"]
+            text = ""
+            for i, delta in enumerate(self._deltas):
+                text += delta
+                evt = {
+                    "type": "event",
+                    "event": "chat",
+                    "payload": {
+                        "runId": run_id,
+                        "state": "final" if i == len(self._deltas) - 1 else "delta",
+                        "message": {"content": [{"type": "text", "text": text}]},
+                    },
+                }
+                self._inbox.put_nowait(json.dumps(evt))
+
+    async def close(self) -> None:
+        self._inbox.put_nowait(None)
+
+
+class _RejectingConnection(_FakeAsyncConnection):
+    """发出 connect.challenge，并以 ok=false 拒绝随后的 connect 请求。"""
+
+    def __init__(self, url: str):
+        super().__init__(url, [])
+        self._inbox = asyncio.Queue()
+        self._inbox.put_nowait(json.dumps({"type": "event", "event": "connect.challenge", "payload": {"nonce": "n"}}))
+
+    async def send(self, message: str) -> None:
+        frame = json.loads(message)
+        self.sent_frames.append(frame)
+        if frame.get("method") == "connect":
+            reply = {"type": "res", "id": frame["id"], "ok": False, "error": {"message": "bad token"}}
+            self._inbox.put_nowait(json.dumps(reply))
+
+
+class _DroppingConnection(_FakeAsyncConnection):
+    """握手前即断开：第一次 recv 就抛出连接关闭异常。"""
+
+    def __init__(self, url: str):
+        super().__init__(url, [])
+        self._inbox = asyncio.Queue()
+        self._inbox.put_nowait(None)
+
+
+class _SendClosedConnection(_FakeAsyncConnection):
+    """连接已被对端关闭但读取端尚未察觉：send 抛出 websockets 的 ConnectionClosed。"""
+
+    async def send(self, message: str) -> None:
+        if json.loads(message).get("method") != "connect":
+            raise ConnectionClosed(None, None)
+        await super().send(message)
+
+
+class _StallingConnectConnection(_FakeAsyncConnection):
+    """直接回 hello-ok，但 connect 请求的发送永远不返回。"""
+
+    async def send(self, message: str) -> None:
+        if json.loads(message).get("method") == "connect":
+            await asyncio.Event().wait()
+        await super().send(message)
+
+
+class TestAsyncAdapter(unittest.IsolatedAsyncioTestCase):
+    async def test_create_connected_and_stream_chat(self) -> None:
+        connections: "List[_FakeAsyncConnection]" = []
+
+        async def factory(url: str) -> _FakeAsyncConnection:
+            conn = _FakeAsyncConnection(url, ["he", "llo"])
+            connections.append(conn)
+            return conn
+
+        settings = AdapterSettings(url="ws://example", session_key="agent:main:main")
+        adapter = await OpenClawChatAsyncWsAdapter.create_connected(
+            settings=settings, timeout_s=2.0, connect_factory=factory
+        )
+        try:
+            self.assertEqual(adapter.hello_payload.get("type"), "hello-ok")
+            chunks = [chunk async for chunk in adapter.stream_chat("hi")]
+            self.assertEqual(chunks, ["he", "llo"])
+            methods = [f.get("method") for f in connections[0].sent_frames]
+            self.assertEqual(methods, ["sessions.patch", "chat.send"])
+        finally:
+            await adapter.stop()
+
+    async def test_request_fails_fast_when_gateway_closes(self) -> None:
+        conn_holder: "List[_FakeAsyncConnection]" = []
+
+        async def factory(url: str) -> _FakeAsyncConnection:
+            conn = _FakeAsyncConnection(url, [])
+            conn_holder.append(conn)
+            return conn
+
+        adapter = OpenClawChatAsyncWsAdapter(AdapterSettings(url="ws://example"), connect_factory=factory)
+        await adapter.start(timeout_s=2.0)
+        try:
+            await conn_holder[0].close()
+            with self.assertRaises(GatewayClosedError):
+                await adapter.request("chat.history", {"sessionKey": "x"}, timeout_s=2.0)
+        finally:
+            await adapter.stop()
+
+    async def test_request_after_gateway_close_fails_without_waiting(self) -> None:
+        conn_holder: "List[_FakeAsyncConnection]" = []
+
+        async def factory(url: str) -> _FakeAsyncConnection:
+            conn = _FakeAsyncConnection(url, [])
+            conn_holder.append(conn)
+            return conn
+
+        adapter = OpenClawChatAsyncWsAdapter(AdapterSettings(url="ws://example"), connect_factory=factory)
+        await adapter.start(timeout_s=2.0)
+        try:
+            await conn_holder[0].close()
+            # 让读取协程先处理关闭，随后的请求不再有等待中的 Future 可被唤醒
+            await asyncio.sleep(0)
+            started = time.monotonic()
+            with self.assertRaises(GatewayClosedError):
+                await adapter.request("chat.history", {"sessionKey": "x"}, timeout_s=5.0)
+            self.assertLess(time.monotonic() - started, 1.0)
+        finally:
+            await adapter.stop()
+
+    @unittest.skipIf(ConnectionClosed is None, "websockets not installed")
+    async def test_request_maps_connection_closed_on_send_to_gateway_closed(self) -> None:
+        async def factory(url: str) -> _FakeAsyncConnection:
+            return _SendClosedConnection(url, [])
+
+        adapter = OpenClawChatAsyncWsAdapter(AdapterSettings(url="ws://example"), connect_factory=factory)
+        await adapter.start(timeout_s=2.0)
+        try:
+            with self.assertRaises(GatewayClosedError):
+                await adapter.request("chat.history", {"sessionKey": "x"}, timeout_s=2.0)
+        finally:
+            await adapter.stop()
+
+    async def test_stream_chat_after_stop_raises_gateway_closed(self) -> None:
+        async def factory(url: str) -> _FakeAsyncConnection:
+            return _FakeAsyncConnection(url, ["hi"])
+
+        adapter = OpenClawChatAsyncWsAdapter(AdapterSettings(url="ws://example"), connect_factory=factory)
+        await adapter.start(timeout_s=2.0)
+        await adapter.stop()
+        with self.assertRaises(GatewayClosedError):
+            async for _ in adapter.stream_chat("hi", timeout_s=5.0):
+                pass
+
+    async def test_start_fails_fast_when_connect_is_rejected(self) -> None:
+        async def factory(url: str) -> _FakeAsyncConnection:
+            return _RejectingConnection(url)
+
+        adapter = OpenClawChatAsyncWsAdapter(AdapterSettings(url="ws://example"), connect_factory=factory)
+        started = time.monotonic()
+        try:
+            with self.assertRaisesRegex(RuntimeError, "bad token"):
+                await adapter.start(timeout_s=5.0)
+            self.assertLess(time.monotonic() - started, 1.0)
+        finally:
+            await adapter.stop()
+
+    async def test_start_raises_gateway_closed_when_connection_drops_before_hello(self) -> None:
+        async def factory(url: str) -> _FakeAsyncConnection:
+            return _DroppingConnection(url)
+
+        adapter = OpenClawChatAsyncWsAdapter(AdapterSettings(url="ws://example"), connect_factory=factory)
+        try:
+            with self.assertRaises(GatewayClosedError):
+                await adapter.start(timeout_s=5.0)
+        finally:
+            await adapter.stop()
+
+    async def test_stop_cancels_pending_fallback_connect(self) -> None:
+        async def factory(url: str) -> _FakeAsyncConnection:
+            return _StallingConnectConnection(url, [])
+
+        settings = AdapterSettings(url="ws://example", connect_fallback_delay_s=0.0)
+        adapter = OpenClawChatAsyncWsAdapter(settings, connect_factory=factory)
+        await adapter.start(timeout_s=2.0)
+        while adapter._connect_sent is False:
+            await asyncio.sleep(0)
+        task = adapter._connect_task
+        self.assertIsNotNone(task)
+        await adapter.stop()
+        await asyncio.sleep(0)
+        self.assertTrue(task.cancelled())
+
+
+if __name__ == "__main__":
+    unittest.main()